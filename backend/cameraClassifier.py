@@ -1,8 +1,24 @@
+import signal
+
+# Set up below; the reload handler is installed first because SIGHUP's default
+# action ends the process, and the API may send it while torch, cv2 and Django
+# are still loading
+classifier = None
+
+def handle_reload(signum, frame):
+    # Explicit reload command, e.g. from the camera-model API endpoint. Before the
+    # classifier exists there is nothing to reload: startup loads the newest checkpoint.
+    if classifier is not None and classifier.reloader is not None:
+        print("Reload signal received, reloading model...")
+        classifier.reloader.request()
+
+if hasattr(signal, 'SIGHUP'):
+    signal.signal(signal.SIGHUP, handle_reload)
+
 import cv2
 import torch
 import numpy as np
-from torchvision import transforms, models
-import torch.nn as nn
+from torchvision import transforms
 from PIL import Image
 import time
 import json
@@ -11,12 +27,31 @@ import sys
 import django
 import matplotlib.pyplot as plt
 import argparse
-import signal
 import serial
+from contextlib import nullcontext
+from frameCache import RecentItemCache, item_signature, signature_distance
+from frameSources import open_frame_source
+from modelLoading import CheckpointReloader, load_model_lowmem
+from statsJournal import StatsJournal
+from captureScheduler import AdaptiveCaptureScheduler, detect_motion
+from pipelineProfiler import PipelineProfiler
+
+# Serial connection to the Arduino, opened by start_camera_classification.
+# Set ARDUINO_PORT (or --serial_port) to your port, e.g. /dev/ttyACM0 or the
+# pseudo-terminal printed by virtualArduino.py
+DEFAULT_SERIAL_PORT = os.environ.get('ARDUINO_PORT', 'COM6')
+arduino = None
 
-# Setup serial connection to Arduino
-arduino = serial.Serial('COM6', 9600, timeout=1)  # Change COM6 to your Arduino port
-time.sleep(2)  # Wait for connection to establish
+def connect_arduino(port=DEFAULT_SERIAL_PORT, baud=9600):
+    global arduino
+    try:
+        arduino = serial.Serial(port, baud, timeout=1)
+        time.sleep(2)  # Wait for connection to establish
+    except serial.SerialException as e:
+        # Keep running without actuation, e.g. when replaying footage on a dev machine
+        print(f"Warning: Could not connect to Arduino: {e}")
+        arduino = None
+    return arduino
 
 # Add the path to your Django project
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -28,36 +63,49 @@ django.setup()
 
 # Import Django models
 from django.contrib.auth.models import User
-from app.models import WasteStatistics, User as CustomUser
+from app.models import CATEGORY_FIELDS, WasteStatistics, User as CustomUser
 
 class WasteClassifier:
-    def __init__(self, model_path, categories_path, supabase_uid=None):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    def __init__(self, model_path, categories_path, supabase_uid=None, model=None, stats_name='waste_stats',
+                 reload_interval=None):
+        if model is not None:
+            # Inputs go wherever the preloaded model lives (CPU when shared between processes)
+            self.device = next(model.parameters()).device
+        else:
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model_path = os.path.join(current_dir, model_path)
         self.categories_path = os.path.join(current_dir, categories_path)
         self.categories = torch.load(self.categories_path)
-        self.model = self.load_model(self.model_path, len(self.categories))
+        # A preloaded model lets several camera processes share one copy of the weights
+        self.model = model if model is not None else self.load_model(self.model_path, len(self.categories))
         self.transform = transforms.Compose([
             transforms.Resize((224, 224)),
             transforms.ToTensor(),
             transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
         ])
-        self.stats = {category: 0 for category in self.categories}
+        # Counters are restored from the snapshot and journal left by previous runs
+        self.journal = StatsJournal(current_dir, self.categories, name=stats_name)
+        self.stats = self.journal.stats
         self.supabase_uid = supabase_uid
+        
+        # Push detections buffered during an earlier database outage
+        if self.journal.pending:
+            self.journal.sync_pending(self.sync_detection)
+        
+        # Hot reload watches the checkpoint files; a shared preloaded model is never swapped
+        self.reloader = None
+        self.model_version = None
+        self.previous_model = None
+        self.reported_error = None
+        if model is None and reload_interval is not None:
+            self.reloader = CheckpointReloader(self.model_path, self.categories_path, self.device,
+                                               reload_interval).start()
+            self.model_version = self.reloader.version
+            self.write_model_status()
     
     def load_model(self, model_path, num_classes):
-        model = models.resnet50(pretrained=False)
-        num_features = model.fc.in_features
-        model.fc = nn.Sequential(
-            nn.Linear(num_features, 512),
-            nn.ReLU(),
-            nn.Dropout(0.5),
-            nn.Linear(512, num_classes)
-        )
-        model.load_state_dict(torch.load(model_path, map_location=self.device))
-        model.to(self.device)
-        model.eval()
-        return model
+        # Meta-device build + memory-mapped checkpoint: weights are only materialized once
+        return load_model_lowmem(model_path, num_classes, self.device)
     
     def preprocess_image(self, image):
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -66,12 +114,57 @@ class WasteClassifier:
         tensor_image = tensor_image.unsqueeze(0)
         return tensor_image
     
+    def apply_model_update(self):
+        # Called between frames: swap in a model the reloader has already validated
+        if self.reloader is None:
+            return
+        staged = self.reloader.take()
+        if staged is not None:
+            self.previous_model = (self.model, self.categories, self.model_version)
+            self.model, self.categories, self.model_version = staged
+            print(f"Switched to model version {self.model_version} "
+                  f"(reload took {self.reloader.last_reload_seconds:.2f}s)")
+            self.write_model_status()
+        elif self.reloader.last_error != self.reported_error:
+            self.write_model_status()
+    
+    def rollback_model(self):
+        self.model, self.categories, self.model_version = self.previous_model
+        self.previous_model = None
+        self.reloader.version = self.model_version
+        self.write_model_status()
+    
+    def write_model_status(self):
+        # Read by the camera-model API endpoint
+        self.reported_error = self.reloader.last_error
+        status = {
+            'pid': os.getpid(),
+            'model_version': self.model_version,
+            'reload_seconds': self.reloader.last_reload_seconds,
+            'last_error': self.reloader.last_error,
+            'updated_at': time.time(),
+        }
+        status_path = os.path.join(current_dir, 'camera_model_status.json')
+        with open(status_path + '.tmp', 'w') as f:
+            json.dump(status, f)
+        os.replace(status_path + '.tmp', status_path)
+    
     def predict(self, image):
-        tensor_image = self.preprocess_image(image)
-        tensor_image = tensor_image.to(self.device)
+        with profile_stage('preprocess_image'):
+            tensor_image = self.preprocess_image(image)
+            tensor_image = tensor_image.to(self.device)
         
-        with torch.no_grad():
-            outputs = self.model(tensor_image)
+        with torch.no_grad(), profile_stage('inference'):
+            try:
+                outputs = self.model(tensor_image)
+            except Exception as e:
+                # A freshly swapped model that fails on real frames is rolled back
+                if self.previous_model is None:
+                    raise
+                print(f"Model version {self.model_version} failed ({e}), rolling back")
+                self.rollback_model()
+                outputs = self.model(tensor_image)
+            self.previous_model = None
             _, predicted = torch.max(outputs, 1)
             probabilities = torch.nn.functional.softmax(outputs, dim=1)
         
@@ -81,11 +174,14 @@ class WasteClassifier:
         return self.categories[class_idx], confidence
     
     def update_stats(self, category):
-        self.stats[category] += 1
+        # Journal the detection first so it survives crashes and database outages
+        self.journal.record_detection(category, self.supabase_uid)
         
         # Convert category to lowercase with underscores for Arduino
         arduino_category = category.lower().replace(' ', '_')
         try:
+            if arduino is None:
+                raise serial.SerialException("Arduino not connected")
             arduino.write((arduino_category + '\n').encode())
             print(f"Sent command to Arduino: {arduino_category}")
         except Exception as e:
@@ -93,46 +189,63 @@ class WasteClassifier:
     
         if not self.supabase_uid:
             print("No Supabase user ID provided, skipping database update")
-            self.save_stats()
             return
-            
+        
+        # Also flushes detections buffered while the database was unreachable
+        with profile_stage('database_sync'):
+            self.journal.sync_pending(self.sync_detection)
+    
+    def sync_detection(self, record):
+        # Raises on database errors so the journal keeps the record for a later retry
         try:
             # Get the user by supabase_uid instead of Django user ID
-            user = CustomUser.objects.get(supabase_uid=self.supabase_uid)
-            stats, created = WasteStatistics.objects.get_or_create(user=user)
-            
-            # Convert category name to database field name (e.g., "Food Organics" -> "food_organics")
-            field_name = category.lower().replace(' ', '_')
-            
-            # Check if the field exists in the model
-            if hasattr(stats, field_name):
-                # Get current value and increment by 1
-                current_value = getattr(stats, field_name)
-                setattr(stats, field_name, current_value + 1)
-                stats.save()
-                print(f"Updated database stats for {category} (user: {user.email})")
-            else:
-                print(f"Warning: Field {field_name} not found in WasteStatistics model")
-                
+            user = CustomUser.objects.get(supabase_uid=record['supabase_uid'])
         except CustomUser.DoesNotExist:
-            print(f"Error: User with Supabase ID {self.supabase_uid} not found")
-        except Exception as e:
-            print(f"Error updating database: {e}")
-            
-        self.save_stats()
+            print(f"Error: User with Supabase ID {record['supabase_uid']} not found")
+            return
+        
+        # Convert category name to database field name (e.g., "Food Organics" -> "food_organics")
+        field_name = record['category'].lower().replace(' ', '_')
+        
+        # Check if the field exists in the model
+        if field_name in CATEGORY_FIELDS:
+            # Atomically increment the user's counter and the global totals
+            WasteStatistics.record_detection(user, field_name)
+            print(f"Updated database stats for {record['category']} (user: {user.email})")
+        else:
+            print(f"Warning: Field {field_name} not found in WasteStatistics model")
     
     def save_stats(self):
-        with open(os.path.join(current_dir, 'waste_stats.json'), 'w') as f:
-            json.dump(self.stats, f)
+        # Compact the journal into the waste_stats.json snapshot
+        self.journal.compact()
 
 cap = None
-classifier = None
+profiler = None
+
+def profile_stage(name):
+    # Times a pipeline stage while a profile capture is running, otherwise a no-op
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+def update_preview(frame, timeout=0.01):
+    # Draws the frame and runs the window's event loop for `timeout` seconds;
+    # returns True once a key is pressed
+    plt.clf()
+    plt.imshow(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    plt.title('Waste Classification')
+    plt.axis('off')
+    plt.draw()
+    plt.pause(0.001)
+    return bool(plt.waitforbuttonpress(timeout=max(timeout, 0.01)))
 
 def handle_termination(signum, frame):
     global cap, classifier  # Add classifier here
     print("Termination signal received, shutting down...")
     if cap is not None:
         cap.release()
+
+    # Keep whatever an in-progress profile capture has collected
+    if profiler is not None:
+        profiler.close()
     
     # Save stats before exiting
     if classifier is not None:
@@ -141,18 +254,28 @@ def handle_termination(signum, frame):
     plt.close('all')
     sys.exit(0)
 
+def handle_profile(signum, frame):
+    # On-demand capture of the next frames while the camera keeps running
+    if profiler is not None:
+        print("Profile signal received")
+        profiler.request()
+
 # Register signal handlers
 signal.signal(signal.SIGTERM, handle_termination)
 signal.signal(signal.SIGINT, handle_termination)
+if hasattr(signal, 'SIGUSR1'):
+    signal.signal(signal.SIGUSR1, handle_profile)
 
-def start_camera_classification(supabase_uid=None):
-    global cap, classifier
+def start_camera_classification(supabase_uid=None, cache_ttl=6.0, source='camera:0', replay=False, fps=30.0,
+                                model=None, display=True, model_path='best_waste_classifier.pth',
+                                stats_name='waste_stats', scheduler=None, reload_interval=5.0, profile_frames=0,
+                                serial_port=None, confidence_threshold=0.7):
+    global cap, classifier, profiler
     # If supabase_uid is provided, use it; otherwise, use a test user
     if supabase_uid:
         try:
             # Get the user by supabase_uid
-            from app.models import User
-            user = User.objects.get(supabase_uid=supabase_uid)
+            user = CustomUser.objects.get(supabase_uid=supabase_uid)
             print(f"Using authenticated user with Supabase ID: {supabase_uid}")
         except Exception as e:
             print(f"Error finding user with Supabase ID {supabase_uid}: {e}")
@@ -163,72 +286,127 @@ def start_camera_classification(supabase_uid=None):
         user, created = User.objects.get_or_create(username='testuser')
         print(f"No Supabase ID provided, using {'new ' if created else ''}test user with ID: {user.id}")
     
-    cap = cv2.VideoCapture(0)
+    if arduino is None:
+        connect_arduino(serial_port or DEFAULT_SERIAL_PORT)
+    
+    # Either a source spec or an already constructed FrameSource
+    cap = open_frame_source(source, fps=fps) if isinstance(source, str) else source
     if not cap.isOpened():
-        print("Error: Could not open camera.")
+        print(f"Error: Could not open frame source '{source}'.")
         return
     
-    classifier = WasteClassifier('best_waste_classifier.pth', 'waste_categories.pth', supabase_uid)
+    classifier = WasteClassifier(model_path, 'waste_categories.pth', supabase_uid, model=model, stats_name=stats_name,
+                                 reload_interval=reload_interval)
     
     bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)
     min_contour_area = 5000
-    confidence_threshold = 0.7
     initial_cooldown = 4  # 4 seconds before first scan
-    subsequent_cooldown = 12  # 12 seconds before second scan
-    last_detection_time = 0
+    subsequent_cooldown = 5  # Panel flip takes ~3 seconds; an item still in view after that is caught by the cache
+    last_detection_time = float('-inf')
     is_first_scan = True
     
-    plt.figure(figsize=(10, 8))
-    plt.ion()
+    # Replay runs as fast as the CPU allows, so cooldowns and cache expiry follow
+    # the footage's own timestamps instead of the wall clock
+    clock = cap.timestamp if replay else time.time
+    # Only the last decision is remembered, until its flip has cleared the panel, and
+    # only the same item in the same place matches it
+    item_cache = RecentItemCache(max_entries=1, ttl=cache_ttl, max_distance=4, clock=clock,
+                                 distance=signature_distance)
+    if scheduler is None:
+        scheduler = AdaptiveCaptureScheduler()
+    profiler = PipelineProfiler(os.path.join(current_dir, 'profiles'), frames=profile_frames or 100)
+    if profile_frames:
+        profiler.request(profile_frames)
+    frames_processed = 0
+    items_classified = 0
+    run_start = time.perf_counter()
     
-    print("Camera started. Press 'q' to quit.")
+    show_frames = display and not replay
+    if replay:
+        print(f"Replaying '{source}' at maximum speed.")
+    if show_frames:
+        plt.figure(figsize=(10, 8))
+        plt.ion()
+        print("Camera started. Press 'q' to quit.")
+    elif not replay:
+        print(f"Camera started on '{source}' without preview window.")
     
     while True:
         ret, frame = cap.read()
         if not ret:
-            print("Error: Failed to capture image")
+            if cap.realtime:
+                print("Error: Failed to capture image")
+            else:
+                print("End of footage reached")
             break
+        frames_processed += 1
+        profiler.on_frame()
+        classifier.apply_model_update()
+        # fsync detections once they are fsync_interval old, even if no more follow
+        classifier.journal.sync_if_due()
         
-        fg_mask = bg_subtractor.apply(frame)
-        _, thresh = cv2.threshold(fg_mask, 244, 255, cv2.THRESH_BINARY)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        current_time = clock()
+        if not scheduler.should_detect(frame, current_time):
+            # Idle: the bin has been empty for a while, so skip background subtraction
+            # and only wake up for cheap frame-difference checks at the idle rate
+            wait = 0.0 if replay else scheduler.seconds_until_due(clock())
+            if show_frames:
+                # The preview keeps updating and the quit key keeps working while idle
+                if update_preview(frame, wait):
+                    break
+            else:
+                time.sleep(wait)
+            # Drop the frames a live camera queued while the loop waited
+            cap.drain()
+            continue
         
-        motion_detected = False
-        for contour in contours:
-            if cv2.contourArea(contour) > min_contour_area:
-                motion_detected = True
-                break
+        with profile_stage('motion_detection'):
+            motion_contour = detect_motion(bg_subtractor, frame, min_contour_area)
+        motion_detected = motion_contour is not None
+        scheduler.update(frame, motion_detected, current_time)
         
-        current_time = time.time()
         cooldown = initial_cooldown if is_first_scan else subsequent_cooldown
         
         if motion_detected and current_time - last_detection_time > cooldown:
-            predicted_class, confidence = classifier.predict(frame)
+            # Skip the item that was just decided if it is still sitting on the panel
+            signature = item_signature(frame, cv2.boundingRect(motion_contour))
+            cached = item_cache.lookup(signature)
             
-            if confidence >= confidence_threshold:
-                text = f"{predicted_class}: {confidence:.2f}"
+            if cached is not None:
+                cached_class, cached_confidence = cached
+                text = f"{cached_class}: {cached_confidence:.2f} (cached)"
                 cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                print(f"Detected: {predicted_class} with confidence {confidence:.2f}")
-                classifier.update_stats(predicted_class)
-                print(f"Action: Moving item to {predicted_class} bin")
-                last_detection_time = current_time
-                is_first_scan = False
             else:
-                print(f"Low confidence detection ({confidence:.2f}), ignoring")
-        
-        plt.clf()
-        plt.imshow(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        plt.title('Waste Classification')
-        plt.axis('off')
-        plt.draw()
-        plt.pause(0.001)
+                with profile_stage('classify'):
+                    predicted_class, confidence = classifier.predict(frame)
+                
+                if confidence >= confidence_threshold:
+                    item_cache.store(signature, (predicted_class, confidence))
+                    text = f"{predicted_class}: {confidence:.2f}"
+                    cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                    print(f"Detected: {predicted_class} with confidence {confidence:.2f}")
+                    with profile_stage('update_stats'):
+                        classifier.update_stats(predicted_class)
+                    items_classified += 1
+                    print(f"Action: Moving item to {predicted_class} bin")
+                    last_detection_time = current_time
+                    is_first_scan = False
+                else:
+                    print(f"Low confidence detection ({confidence:.2f}), ignoring")
         
-        if plt.waitforbuttonpress(timeout=0.01):
+        if show_frames and update_preview(frame):
             break
     
+    elapsed = time.perf_counter() - run_start
+    profiler.close()
     cap.release()
+    classifier.save_stats()
     plt.close('all')
     
+    print(f"\nProcessed {frames_processed} frames in {elapsed:.1f}s "
+          f"({frames_processed / elapsed if elapsed > 0 else 0:.1f} frames/sec), {items_classified} items classified")
+    print(scheduler.report())
+    
     if supabase_uid:
         try:
             user = CustomUser.objects.get(supabase_uid=supabase_uid)
@@ -246,6 +424,31 @@ def start_camera_classification(supabase_uid=None):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run waste classification camera')
     parser.add_argument('--supabase_uid', type=str, help='Supabase user ID')
+    parser.add_argument('--cache_ttl', type=float, default=6.0,
+                        help='Seconds the last classified item is remembered while the panel flips it away')
+    parser.add_argument('--source', type=str, default='camera:0',
+                        help='Frame source: camera[:index], video:<path>, images:<dir> or synthetic[:frames]')
+    parser.add_argument('--fps', type=float, default=30.0,
+                        help='Frame rate assumed for image directory and synthetic sources')
+    parser.add_argument('--replay', action='store_true',
+                        help='Process frames as fast as possible using footage timestamps for cooldowns')
+    parser.add_argument('--model', type=str, default='best_waste_classifier.pth',
+                        help='Classifier checkpoint; fp16/bf16 checkpoints from modelLoading.py are upcast on load')
+    parser.add_argument('--idle_after', type=float, default=30.0,
+                        help='Seconds without motion before dropping to the idle frame rate (0 disables)')
+    parser.add_argument('--idle_fps', type=float, default=2.0,
+                        help='Frames per second checked with frame differencing while idle')
+    parser.add_argument('--wake_threshold', type=float, default=0.01,
+                        help='Fraction of changed pixels that returns the loop to full rate')
+    parser.add_argument('--reload_interval', type=float, default=5.0,
+                        help='Seconds between checkpoint change checks for hot reload (0 reloads only on SIGHUP)')
+    parser.add_argument('--profile_frames', type=int, default=0,
+                        help='Profile the first N frames; SIGUSR1 profiles the next N (default 100) at any time')
+    parser.add_argument('--serial_port', type=str, default=DEFAULT_SERIAL_PORT,
+                        help='Arduino serial port (default: $ARDUINO_PORT or COM6)')
     args = parser.parse_args()
     
-    start_camera_classification(args.supabase_uid)
+    scheduler = AdaptiveCaptureScheduler(args.idle_after, args.idle_fps, args.wake_threshold)
+    start_camera_classification(args.supabase_uid, args.cache_ttl, args.source, args.replay, args.fps,
+                                model_path=args.model, scheduler=scheduler, reload_interval=args.reload_interval,
+                                profile_frames=args.profile_frames, serial_port=args.serial_port)
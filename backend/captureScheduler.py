@@ -0,0 +1,241 @@
+import argparse
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from frameSources import SyntheticSource, drain_queued_frames
+
+
+def detect_motion(bg_subtractor, frame, min_contour_area):
+    # Returns the first foreground contour larger than min_contour_area, or None
+    fg_mask = bg_subtractor.apply(frame)
+    _, thresh = cv2.threshold(fg_mask, 244, 255, cv2.THRESH_BINARY)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        if cv2.contourArea(contour) > min_contour_area:
+            return contour
+    return None
+
+
+class AdaptiveCaptureScheduler:
+    """Duty-cycles motion detection while the bin is empty.
+
+    In active mode every frame goes through background subtraction. After
+    `idle_after` seconds without motion it switches to idle mode: frames are only
+    looked at `idle_fps` times per second, using cheap frame differencing on a
+    small grayscale thumbnail. A change above `wake_threshold` (fraction of
+    changed pixels) switches straight back to active mode. `idle_after=0`
+    disables idling.
+    """
+
+    THUMBNAIL_SIZE = (160, 120)
+    PIXEL_DELTA = 25
+
+    def __init__(self, idle_after=30.0, idle_fps=2.0, wake_threshold=0.01):
+        self.idle_after = idle_after
+        self.idle_interval = 1.0 / idle_fps
+        self.wake_threshold = wake_threshold
+        self.idle = False
+        self.last_motion_time = None
+        self.last_idle_check = None
+        self.reference = None
+
+        # Wall time and CPU time spent in each mode, for the end-of-run report
+        self.mode_wall = {'active': 0.0, 'idle': 0.0}
+        self.mode_cpu = {'active': 0.0, 'idle': 0.0}
+        self.wakeups = 0
+        self._mark_wall = time.perf_counter()
+        self._mark_cpu = time.process_time()
+
+    @property
+    def mode(self):
+        return 'idle' if self.idle else 'active'
+
+    def _account(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        self.mode_wall[self.mode] += wall - self._mark_wall
+        self.mode_cpu[self.mode] += cpu - self._mark_cpu
+        self._mark_wall, self._mark_cpu = wall, cpu
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(cv2.resize(frame, self.THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def seconds_until_due(self, now):
+        # How long an idle loop can sleep before the next frame needs checking
+        if not self.idle or self.last_idle_check is None:
+            return 0.0
+        return max(0.0, self.last_idle_check + self.idle_interval - now)
+
+    def should_detect(self, frame, now):
+        """Return True if this frame needs full motion detection.
+
+        In idle mode frames between checks are dropped without any processing, and
+        checked frames only wake the loop if they differ from the previous check.
+        """
+        if not self.idle:
+            return True
+        if self.seconds_until_due(now) > 0:
+            return False
+
+        self.last_idle_check = now
+        thumbnail = self._thumbnail(frame)
+        changed = np.count_nonzero(cv2.absdiff(thumbnail, self.reference) > self.PIXEL_DELTA) / thumbnail.size
+        self.reference = thumbnail
+        if changed < self.wake_threshold:
+            return False
+
+        self._account()
+        self.idle = False
+        self.wakeups += 1
+        self.last_motion_time = now
+        return True
+
+    def update(self, frame, motion_detected, now):
+        # Called after full motion detection on an active-mode frame
+        if self.last_motion_time is None or motion_detected:
+            self.last_motion_time = now
+        elif self.idle_after > 0 and now - self.last_motion_time >= self.idle_after:
+            self._account()
+            self.idle = True
+            self.last_idle_check = now
+            self.reference = self._thumbnail(frame)
+
+    def report(self):
+        self._account()
+        lines = []
+        for mode in ('active', 'idle'):
+            wall = self.mode_wall[mode]
+            cpu_percent = 100 * self.mode_cpu[mode] / wall if wall > 0 else 0.0
+            lines.append(f"{mode:>6}: {wall:8.1f}s wall, CPU {cpu_percent:5.1f}%")
+        lines.append(f"wakeups from idle: {self.wakeups}")
+        return '\n'.join(lines)
+
+
+class EmulatedCamera:
+    """Plays a source at its frame rate the way a live camera would.
+
+    read() blocks until the next frame is due. Like a V4L2 webcam, the driver
+    holds up to `queue_frames` captured frames that were not read yet and drops
+    newer ones while they are all full, so a loop that sleeps reads old frames
+    unless it calls drain(). `queue_frames=0` always returns the latest frame.
+    """
+
+    realtime = True
+
+    def __init__(self, source, queue_frames=4):
+        self.source = source
+        self.fps = source.fps
+        self.queue_frames = queue_frames
+        self.queue = deque()  # indices of captured frames not read yet
+        self.captured = -1
+        self.grabbed = None
+        # The footage starts rolling on the first read, not during pipeline setup
+        self.start = None
+
+    def __repr__(self):
+        return f'emulated camera ({type(self.source).__name__})'
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def release(self):
+        self.source.release()
+
+    def timestamp(self):
+        return time.perf_counter() - self.start if self.start is not None else 0.0
+
+    def _capture(self):
+        # Frames the sensor produced since the last call fill the free driver buffers
+        latest = int(self.timestamp() * self.fps)
+        produced = range(self.captured + 1, latest + 1)
+        if self.queue_frames > 0:
+            self.queue.extend(produced[:self.queue_frames - len(self.queue)])
+        elif produced:
+            self.queue = deque([produced[-1]])
+        self.captured = max(self.captured, latest)
+
+    def grab(self):
+        if self.start is None:
+            self.start = time.perf_counter()
+        self._capture()
+        if not self.queue:
+            # Block until the next frame's capture time, like cap.grab() on a webcam
+            time.sleep(max(0.0, (self.captured + 1) / self.fps - self.timestamp()))
+            self._capture()
+        self.grabbed = self.queue.popleft()
+        return True
+
+    def retrieve(self):
+        if self.grabbed is None:
+            return False, None
+        # Only the frames actually read are generated
+        self.source.frame_index, self.grabbed = self.grabbed, None
+        return self.source.read()
+
+    def read(self):
+        if self.grabbed is None:
+            self.grab()
+        return self.retrieve()
+
+    def drain(self):
+        drain_queued_frames(self, self.fps)
+
+
+def benchmark(duration, fps, period, idle_after, idle_fps, wake_threshold, min_contour_area=5000):
+    """Run the motion stage on a synthetic bin in real time and report CPU use and
+    how long after an item appears motion is detected."""
+    print(f"{'mode':<10} {'CPU %':>7} {'latency mean ms':>16} {'latency max ms':>15} {'missed':>7}")
+    for label, idle_seconds in (('always-on', 0.0), ('adaptive', idle_after)):
+        num_frames = int(duration * fps)
+        source = SyntheticSource(num_frames=num_frames, fps=fps, period=period, item_frames=period // 3)
+        camera = EmulatedCamera(source)
+        bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)
+        scheduler = AdaptiveCaptureScheduler(idle_seconds, idle_fps, wake_threshold)
+
+        # Item 0 appears before the background model has learned the scene, so skip it
+        onsets = [k * period / fps for k in range(1, (num_frames - 1) // period + 1)]
+        detections = []
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        while True:
+            ret, frame = camera.read()
+            if not ret:
+                break
+            now = camera.timestamp()
+            if not scheduler.should_detect(frame, now):
+                time.sleep(scheduler.seconds_until_due(camera.timestamp()))
+                camera.drain()
+                continue
+            motion = detect_motion(bg_subtractor, frame, min_contour_area) is not None
+            scheduler.update(frame, motion, now)
+            if motion:
+                detections.append(now)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+
+        # Latency: first detection after each item onset, within that item's period
+        latencies, missed = [], 0
+        for onset in onsets:
+            hits = [t for t in detections if onset <= t < onset + period / fps]
+            if hits:
+                latencies.append(hits[0] - onset)
+            else:
+                missed += 1
+        mean_ms = 1000 * sum(latencies) / len(latencies) if latencies else 0.0
+        max_ms = 1000 * max(latencies, default=0.0)
+        print(f"{label:<10} {100 * cpu / wall:7.1f} {mean_ms:16.1f} {max_ms:15.1f} {missed:7d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark adaptive capture against always-on motion detection')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds of simulated footage per mode')
+    parser.add_argument('--fps', type=float, default=30.0, help='Simulated camera frame rate')
+    parser.add_argument('--period', type=int, default=300, help='Frames between items')
+    parser.add_argument('--idle_after', type=float, default=3.0, help='Quiet seconds before idling')
+    parser.add_argument('--idle_fps', type=float, default=2.0, help='Frame rate checked while idle')
+    parser.add_argument('--wake_threshold', type=float, default=0.01, help='Changed-pixel fraction that wakes the loop')
+    args = parser.parse_args()
+
+    benchmark(args.duration, args.fps, args.period, args.idle_after, args.idle_fps, args.wake_threshold)
@@ -1,4 +1,6 @@
 import os
+import json
+import argparse
 import cv2
 import numpy as np
 import torch
@@ -9,16 +11,23 @@ from torchvision import transforms, models
 from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
 from PIL import Image
+from modelLoading import save_checkpoint_atomic, load_model_eager, promote_checkpoint
+from modelPruning import count_flops, measure_latency, prunable_channels, prune_channels
 
 # Configuration
 IMG_SIZE = 224
 BATCH_SIZE = 32
 EPOCHS = 20
 LEARNING_RATE = 0.001
+FINETUNE_LEARNING_RATE = 0.0001
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
 DATASET_PATH = os.path.join(current_dir, 'dataset')
+# Cameras hot-reload DEPLOY_PATH, so training keeps its best-so-far checkpoint
+# elsewhere and only the finished model is promoted
+DEPLOY_PATH = os.path.join(current_dir, 'best_waste_classifier.pth')
+TRAINING_CHECKPOINT_PATH = os.path.join(current_dir, 'training_waste_classifier.pth')
 
 # Custom Dataset class
 class WasteDataset(Dataset):
@@ -89,8 +98,9 @@ def create_model(num_classes):
     return model
 
 # Training function
-def train_model(model, train_loader, val_loader, criterion, optimizer, num_epochs):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+def train_model(model, train_loader, val_loader, criterion, optimizer, num_epochs,
+                checkpoint_path=TRAINING_CHECKPOINT_PATH, device=None):
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
     
     best_val_acc = 0.0
@@ -149,15 +159,15 @@ def train_model(model, train_loader, val_loader, criterion, optimizer, num_epoch
         print(f'Val Loss: {val_epoch_loss:.4f}, Val Acc: {val_epoch_acc:.4f}')
         
         # Save the best model
-        if val_epoch_acc > best_val_acc:
+        if checkpoint_path and val_epoch_acc > best_val_acc:
             best_val_acc = val_epoch_acc
-            torch.save(model.state_dict(), 'best_waste_classifier.pth')
+            save_checkpoint_atomic(model.state_dict(), checkpoint_path)
     
     return model, history
 
-# Function to test the model
-def test_model(model, test_loader):
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# Accuracy of the model on a data loader
+def evaluate_accuracy(model, data_loader, device=None):
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
     model.eval()
     
@@ -165,14 +175,18 @@ def test_model(model, test_loader):
     total = 0
     
     with torch.no_grad():
-        for inputs, labels in test_loader:
+        for inputs, labels in data_loader:
             inputs, labels = inputs.to(device), labels.to(device)
             outputs = model(inputs)
             _, predicted = torch.max(outputs, 1)
             total += labels.size(0)
             correct += (predicted == labels).sum().item()
     
-    test_acc = correct / total
+    return correct / total
+
+# Function to test the model
+def test_model(model, test_loader):
+    test_acc = evaluate_accuracy(model, test_loader)
     print(f'Test Accuracy: {test_acc:.4f}')
     
     return test_acc
@@ -201,13 +215,11 @@ def plot_history(history):
     plt.savefig('training_history.png')
     plt.show()
 
-# Main function to execute the training pipeline
-def main():
-    # Load dataset
+# Load the dataset and split it into train/validation/test loaders
+def build_loaders(dataset_path):
     print("Loading dataset...")
-    images, labels, categories = load_dataset(DATASET_PATH)
+    images, labels, categories = load_dataset(dataset_path)
     print(f"Dataset loaded: {len(images)} images")
-    num_classes = len(categories)
     
     # Split dataset
     X_train, X_temp, y_train, y_temp = train_test_split(images, labels, test_size=0.3, random_state=42)
@@ -227,6 +239,13 @@ def main():
     val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE)
     test_loader = DataLoader(test_dataset, batch_size=BATCH_SIZE)
     
+    return train_loader, val_loader, test_loader, categories
+
+# Main function to execute the training pipeline
+def main(dataset_path=DATASET_PATH):
+    train_loader, val_loader, test_loader, categories = build_loaders(dataset_path)
+    num_classes = len(categories)
+    
     # Create model
     model = create_model(num_classes)
     
@@ -247,6 +266,123 @@ def main():
     
     return model, categories
 
+# Measure one point of the accuracy/latency curve
+def pruning_level(model, val_loader, step, base_channels):
+    level = {
+        'step': step,
+        'sparsity': 1 - prunable_channels(model) / base_channels,
+        'params_m': sum(p.numel() for p in model.parameters()) / 1e6,
+        'gflops': count_flops(model) / 1e9,
+        'latency_ms': measure_latency(model),
+        'val_acc': evaluate_accuracy(model, val_loader),
+    }
+    print(f"Step {step}: sparsity {level['sparsity']:.1%}, {level['params_m']:.1f}M params, "
+          f"{level['gflops']:.2f} GFLOPs, {level['latency_ms']:.1f} ms, val acc {level['val_acc']:.4f}")
+    return level
+
+# Iterative structured pruning: remove channels, fine-tune, repeat until the budget is met
+def prune_model(model, train_loader, val_loader, target_flops=None, target_latency=None, step_ratio=0.1,
+                finetune_epochs=2, max_steps=10):
+    # The whole backbone is fine-tuned after each step, not just the classifier head
+    for param in model.parameters():
+        param.requires_grad = True
+    criterion = nn.CrossEntropyLoss()
+    base_channels = prunable_channels(model)
+    curve = [pruning_level(model, val_loader, 0, base_channels)]
+    base_gflops = curve[0]['gflops']
+    
+    def budget_met(level):
+        return ((target_flops is not None and level['gflops'] <= target_flops * base_gflops) or
+                (target_latency is not None and level['latency_ms'] <= target_latency))
+    
+    for step in range(1, max_steps + 1):
+        if budget_met(curve[-1]):
+            break
+        
+        if prune_channels(model, step_ratio) == 0:
+            print("Every block is at the minimum width, stopping")
+            break
+        # Surgery replaced the pruned layers, so the optimizer needs the new parameters
+        optimizer = optim.Adam(model.parameters(), lr=FINETUNE_LEARNING_RATE)
+        model, _ = train_model(model, train_loader, val_loader, criterion, optimizer, finetune_epochs,
+                               checkpoint_path=None)
+        curve.append(pruning_level(model, val_loader, step, base_channels))
+    
+    # Judged on the last level, which the final step may have brought under budget
+    if not budget_met(curve[-1]):
+        print(f"Budget not reached after {curve[-1]['step']} steps")
+    
+    return model, curve
+
+# Function to plot accuracy and latency against sparsity
+def plot_pruning_curve(curve, path):
+    sparsity = [100 * level['sparsity'] for level in curve]
+    
+    plt.figure(figsize=(12, 4))
+    
+    plt.subplot(1, 2, 1)
+    plt.plot(sparsity, [level['val_acc'] for level in curve], marker='o')
+    plt.xlabel('Pruned channels (%)')
+    plt.ylabel('Validation Accuracy')
+    plt.title('Accuracy vs Sparsity')
+    
+    plt.subplot(1, 2, 2)
+    plt.plot(sparsity, [level['latency_ms'] for level in curve], marker='o')
+    plt.xlabel('Pruned channels (%)')
+    plt.ylabel('Latency (ms)')
+    plt.title('Single-image Latency vs Sparsity')
+    
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+# Prune a trained checkpoint into a smaller one that WasteClassifier loads as-is
+def prune_main(args):
+    train_loader, val_loader, test_loader, categories = build_loaders(args.dataset)
+    model = load_model_eager(os.path.join(current_dir, args.model), len(categories), torch.device('cpu'))
+    
+    print("Starting pruning...")
+    model, curve = prune_model(model, train_loader, val_loader, args.target_flops, args.target_latency,
+                               args.prune_step, args.finetune_epochs, args.max_steps)
+    test_model(model, test_loader)
+    
+    output_path = os.path.join(current_dir, args.output)
+    save_checkpoint_atomic(model.to('cpu').state_dict(), output_path)
+    curve_path = os.path.splitext(output_path)[0] + '_curve'
+    with open(curve_path + '.json', 'w') as f:
+        json.dump(curve, f, indent=2)
+    plot_pruning_curve(curve, curve_path + '.png')
+    print(f"Saved {output_path} and {curve_path}.json/.png")
+
 if __name__ == "__main__":
-    model, categories = main()
-    torch.save(categories, 'waste_categories.pth')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the waste classifier, or prune a trained one')
+    parser.add_argument('--dataset', type=str, default=DATASET_PATH, help='Dataset directory')
+    parser.add_argument('--prune', action='store_true', help='Prune --model instead of training from scratch')
+    parser.add_argument('--model', type=str, default='best_waste_classifier.pth', help='Checkpoint to prune')
+    parser.add_argument('--output', type=str, default='pruned_waste_classifier.pth', help='Pruned checkpoint path')
+    parser.add_argument('--target_flops', type=float,
+                        help='Stop once FLOPs are at most this fraction of the original (e.g. 0.5)')
+    parser.add_argument('--target_latency', type=float, help='Stop once single-image latency is at most this (ms)')
+    parser.add_argument('--prune_step', type=float, default=0.1,
+                        help='Fraction of the remaining inner channels removed per step')
+    parser.add_argument('--finetune_epochs', type=int, default=2, help='Fine-tuning epochs after each step')
+    parser.add_argument('--max_steps', type=int, default=10, help='Maximum number of pruning steps')
+    parser.add_argument('--no_deploy', action='store_true',
+                        help=f'Keep the trained model in {os.path.basename(TRAINING_CHECKPOINT_PATH)} instead of '
+                             f'promoting it to {os.path.basename(DEPLOY_PATH)}')
+    args = parser.parse_args()
+    
+    if args.prune:
+        if args.target_flops is None and args.target_latency is None:
+            parser.error('--prune needs --target_flops or --target_latency')
+        prune_main(args)
+    else:
+        model, categories = main(args.dataset)
+        # Next to the deployed model, written atomically: the reloader watches both files
+        save_checkpoint_atomic(categories, os.path.join(current_dir, 'waste_categories.pth'))
+        if args.no_deploy:
+            print(f"Best model kept in {TRAINING_CHECKPOINT_PATH}; deploy it with "
+                  f"python modelLoading.py --promote {TRAINING_CHECKPOINT_PATH}")
+        else:
+            promote_checkpoint(TRAINING_CHECKPOINT_PATH, DEPLOY_PATH)
+            print(f"Promoted the best model to {DEPLOY_PATH}")
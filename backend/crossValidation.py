@@ -0,0 +1,142 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from sklearn.model_selection import StratifiedKFold
+from torch.utils.data import DataLoader, Subset
+
+from classificationModel import (BATCH_SIZE, DATASET_PATH, EPOCHS, LEARNING_RATE, WasteDataset, create_model,
+                                 evaluate_accuracy, load_dataset, train_model, train_transform, val_transform)
+
+# Set in each worker by init_worker
+shared_images = None
+shared_labels = None
+
+
+def get_context():
+    # fork hands the dataset to workers without copying; spawn passes the shared
+    # memory tensors by handle
+    method = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+    return mp.get_context(method)
+
+
+def init_worker(images, labels, threads):
+    global shared_images, shared_labels
+    torch.set_num_threads(threads)
+    shared_images, shared_labels = images, labels
+
+
+def seed_fold(seed):
+    # Forked workers inherit the parent's RNG state, so without this every fold
+    # would start from the same head weights and shuffle order
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def run_fold(fold, train_idx, test_idx, epochs, seed, verbose=False):
+    # A fold's result depends only on its seed, not on which worker ran it or what ran before
+    seed_fold(seed + fold)
+    # numpy() views the shared tensor, so the workers never copy the image array
+    images, labels = shared_images.numpy(), shared_labels.numpy()
+    train_loader = DataLoader(Subset(WasteDataset(images, labels, transform=train_transform), train_idx),
+                              batch_size=BATCH_SIZE, shuffle=True,
+                              generator=torch.Generator().manual_seed(seed + fold))
+    test_loader = DataLoader(Subset(WasteDataset(images, labels, transform=val_transform), test_idx),
+                             batch_size=BATCH_SIZE)
+
+    start = time.perf_counter()
+    # Same model and optimizer as classificationModel.main, so head and augmentation
+    # changes made there are what gets evaluated
+    model = create_model(len(np.unique(labels)))
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.fc.parameters(), lr=LEARNING_RATE)
+    # Folds are sized to CPU cores, and CUDA initialized in the parent (by the
+    # sequential baseline) would break every fold of a forked pool
+    device = torch.device('cpu')
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        model, _ = train_model(model, train_loader, test_loader, criterion, optimizer, epochs, checkpoint_path=None,
+                               device=device)
+    accuracy = evaluate_accuracy(model, test_loader, device)
+    return fold, accuracy, time.perf_counter() - start
+
+
+def cross_validate(images, labels, folds=5, workers=None, threads=None, epochs=EPOCHS, seed=42, verbose=False):
+    """Train and score one model per fold, `workers` folds at a time.
+
+    Fold k is seeded with `seed + k`, so parallel and sequential runs train the
+    same models. Returns the per-fold results sorted by fold and the wall-clock time.
+    """
+    workers = workers or min(folds, os.cpu_count() or 1)
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    # Loaded once in the parent and placed in shared memory for every worker
+    images = torch.from_numpy(images).share_memory_()
+    labels = torch.from_numpy(labels).share_memory_()
+
+    # Fetch the pretrained backbone once, rather than from every worker at the same time
+    create_model(len(np.unique(labels.numpy())))
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    tasks = [(fold, train_idx, test_idx, epochs, seed, verbose)
+             for fold, (train_idx, test_idx) in enumerate(splitter.split(np.zeros(len(labels)), labels.numpy()))]
+
+    print(f"Running {folds} folds on {workers} workers with {threads} torch threads each...")
+    start = time.perf_counter()
+    if workers == 1:
+        init_worker(images, labels, threads)
+        results = [run_fold(*task) for task in tasks]
+    else:
+        with get_context().Pool(workers, initializer=init_worker, initargs=(images, labels, threads)) as pool:
+            results = pool.starmap(run_fold, tasks)
+    wall = time.perf_counter() - start
+    return sorted(results), wall
+
+
+def print_summary(results, wall, sequential_wall=None):
+    print(f"\n{'fold':>4} {'accuracy':>9} {'train s':>8}")
+    for fold, accuracy, seconds in results:
+        print(f"{fold:4d} {accuracy:9.4f} {seconds:8.1f}")
+
+    accuracies = [accuracy for _, accuracy, _ in results]
+    variance = statistics.variance(accuracies) if len(accuracies) > 1 else 0.0
+    print(f"\nAccuracy: mean {statistics.mean(accuracies):.4f}, std {variance ** 0.5:.4f}, variance {variance:.6f}")
+
+    fold_seconds = sum(seconds for _, _, seconds in results)
+    print(f"Wall clock: {wall:.1f}s for {fold_seconds:.1f}s of fold training ({fold_seconds / wall:.2f}x overlap)")
+    if sequential_wall is not None:
+        print(f"Sequential baseline: {sequential_wall:.1f}s, speedup {sequential_wall / wall:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Parallel k-fold cross-validation of the waste classifier')
+    parser.add_argument('--dataset', type=str, default=DATASET_PATH, help='Dataset directory')
+    parser.add_argument('--folds', type=int, default=5, help='Number of folds')
+    parser.add_argument('--workers', type=int, help='Folds trained at once (default: one per core, up to --folds)')
+    parser.add_argument('--threads', type=int, help='Torch threads per worker (default: cores / workers)')
+    parser.add_argument('--epochs', type=int, default=EPOCHS, help='Training epochs per fold')
+    parser.add_argument('--seed', type=int, default=42, help='Base seed for the splits; fold k trains with seed + k')
+    parser.add_argument('--sequential_baseline', action='store_true',
+                        help='Also run the folds one after another with every core, to measure the speedup')
+    parser.add_argument('--verbose', action='store_true', help='Show per-epoch training output')
+    args = parser.parse_args()
+
+    print("Loading dataset...")
+    images, labels, categories = load_dataset(args.dataset)
+    print(f"Dataset loaded: {len(images)} images")
+
+    sequential_wall = None
+    if args.sequential_baseline:
+        _, sequential_wall = cross_validate(images, labels, args.folds, workers=1, threads=os.cpu_count() or 1,
+                                            epochs=args.epochs, seed=args.seed, verbose=args.verbose)
+    results, wall = cross_validate(images, labels, args.folds, args.workers, args.threads, args.epochs, args.seed,
+                                   args.verbose)
+    print_summary(results, wall, sequential_wall)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import WasteStatistics
+from .models import WasteStatistics, GlobalWasteStatistics
 
 # Register your models here.
 admin.site.register(WasteStatistics)
+admin.site.register(GlobalWasteStatistics)
@@ -0,0 +1,13 @@
+from django.urls import path
+from .async_views import AsyncWasteStatisticsView, AsyncUserAuthView
+from .urls import urlpatterns as sync_urlpatterns
+
+# Same routes as app/urls.py, with the dashboard views swapped for their async versions
+async_urlpatterns = [
+    path('waste-statistics/', AsyncWasteStatisticsView.as_view(), name='waste-statistics'),
+    path('waste-statistics/<int:pk>/', AsyncWasteStatisticsView.as_view(), name='waste-statistics-detail'),
+    path('auth/user/', AsyncUserAuthView.as_view(), name='user-auth'),
+]
+
+async_names = {pattern.name for pattern in async_urlpatterns}
+urlpatterns = async_urlpatterns + [pattern for pattern in sync_urlpatterns if pattern.name not in async_names]
@@ -0,0 +1,138 @@
+# app/async_views.py
+# Async ORM versions of the dashboard views, served natively by the ASGI handler.
+# Responses are rendered with DRF's JSONRenderer so bodies and status codes match
+# the sync APIViews in views.py byte for byte.
+import json
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.renderers import JSONRenderer
+
+from .models import WasteStatistics, User
+from .serializers import WasteStatisticsSerializer
+
+STATS_DEFAULTS = {
+    'paper': 0,
+    'glass': 0,
+    'food_organics': 0,
+    'metal': 0,
+    'cardboard': 0,
+    'miscellaneous_trash': 0
+}
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def parse_body(request):
+    # DRF parses JSON and form bodies for the sync views; accept the same here,
+    # raising the exceptions DRF would
+    if not int(request.META.get('CONTENT_LENGTH') or 0):
+        return {}
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body)
+        except ValueError as e:
+            raise ParseError(f"JSON parse error - {str(e)}")
+    if request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        return request.POST
+    raise UnsupportedMediaType(request.content_type)
+
+
+class AsyncAPIView(View):
+    """Async View whose error responses and headers match DRF's APIView."""
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        async def not_allowed():
+            return json_response({"detail": f'Method "{request.method}" not allowed.'},
+                                 status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        return not_allowed()
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.finalize_response(super().dispatch(request, *args, **kwargs))
+
+    async def finalize_response(self, response):
+        response = await response
+        response['Allow'] = ', '.join(self._allowed_methods())
+        # DRF varies on Accept for content negotiation, and on Cookie because its
+        # session authentication reads the session on every request
+        patch_vary_headers(response, ['Accept', 'Cookie'])
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncUserAuthView(AsyncAPIView):
+    async def post(self, request):
+        try:
+            data = parse_body(request)
+        except (ParseError, UnsupportedMediaType) as e:
+            return json_response({"detail": e.detail}, status=e.status_code)
+
+        supabase_uid = data.get('supabase_uid')
+        email = data.get('email')
+
+        if not supabase_uid:
+            return json_response(
+                {"error": "supabase_uid is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # Get or create user
+            user, created = await User.objects.aget_or_create(
+                supabase_uid=supabase_uid,
+                defaults={'email': email}
+            )
+
+            # If user exists but email changed, update it
+            if not created and email and user.email != email:
+                user.email = email
+                await user.asave()
+
+            # Create waste statistics for new users with all fields explicitly set to 0
+            await WasteStatistics.objects.aget_or_create(user=user, defaults=STATS_DEFAULTS)
+
+            return json_response(
+                {"id": user.id, "supabase_uid": user.supabase_uid, "email": user.email},
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            )
+        except Exception as e:
+            return json_response(
+                {"error": f"Failed to create or update user: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class AsyncWasteStatisticsView(AsyncAPIView):
+    async def get(self, request, pk=None):
+        supabase_uid = request.GET.get('supabase_uid')
+
+        if not supabase_uid:
+            return json_response(
+                {"error": "supabase_uid query parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # Try to get the user
+            try:
+                user = await User.objects.aget(supabase_uid=supabase_uid)
+            except User.DoesNotExist:
+                # Create the user if they don't exist
+                user = await User.objects.acreate(supabase_uid=supabase_uid, email=None)
+
+            # Get or create statistics for this user with explicit defaults
+            stats, created = await WasteStatistics.objects.aget_or_create(user=user, defaults=STATS_DEFAULTS)
+
+            return json_response(WasteStatisticsSerializer(stats).data)
+        except Exception as e:
+            return json_response(
+                {"error": f"Failed to get or create statistics: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -1,27 +1,153 @@
+import asyncio
+import contextlib
+import logging
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from .models import WasteStatistics, User
+from .serializers import WasteStatisticsSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def stats_delta(previous, current):
+    # Fields whose value changed since the state a connection last received
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+def is_newer(stats, snapshot):
+    # Compares the ISO 8601 updated_at written by WasteStatisticsSerializer. An
+    # event that was already committed when the snapshot was read is not newer.
+    if not snapshot.get('updated_at'):
+        return True
+    updated_at = parse_datetime(stats.get('updated_at') or '')
+    return updated_at is not None and updated_at > parse_datetime(snapshot['updated_at'])
+
+
+class GroupFanout:
+    """Process-wide fan-out of one user's stats group to the local websockets.
+
+    The process subscribes to the group once, however many tabs are open, and
+    keeps only the latest stats it has received. Connections are updated at most
+    `max_rate` times per second; a burst of events in between collapses into
+    a single send. A `max_rate` of 0 sends every event immediately.
+    """
+
+    def __init__(self, channel_layer, group, max_rate):
+        self.channel_layer = channel_layer
+        self.group = group
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.members = set()
+        self.latest = None
+        self.last_flush = float('-inf')
+        self.flush_task = None
+        self.channel = None
+        self.receive_task = None
+
+    async def start(self):
+        self.channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(self.group, self.channel)
+        self.receive_task = asyncio.create_task(self.receive_loop())
+
+    async def stop(self):
+        for task in (self.receive_task, self.flush_task):
+            if task is not None:
+                task.cancel()
+        if self.channel is not None:
+            await self.channel_layer.group_discard(self.group, self.channel)
+
+    async def receive_loop(self):
+        while True:
+            message = await self.channel_layer.receive(self.channel)
+            if message.get('type') == 'stats.update':
+                await self.update(message['stats'])
+
+    async def update(self, stats):
+        self.latest = stats
+        if self.interval == 0:
+            await self.flush()
+        elif self.flush_task is None:
+            loop = asyncio.get_running_loop()
+            delay = max(0.0, self.last_flush + self.interval - loop.time())
+            self.flush_task = asyncio.create_task(self.flush_after(delay))
+
+    async def flush_after(self, delay):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        self.last_flush = asyncio.get_running_loop().time()
+        for member in list(self.members):
+            try:
+                await member.send_stats(self.latest)
+            except Exception:
+                # A dead connection must not stop the other tabs' updates or the receive loop.
+                # Closing it lets its disconnect tear the group down if it was the last one.
+                logger.exception("Dropping websocket from %s after a failed send", self.group)
+                self.members.discard(member)
+                with contextlib.suppress(Exception):
+                    await member.close()
+
+
+# group name -> GroupFanout, for the groups with connections in this process
+group_fanouts = {}
+
 
 class StatsConsumer(AsyncJsonWebsocketConsumer):
+    # Protocol: a {"type": "snapshot", "stats": {...}} message with the full stats on
+    # connect, then {"type": "delta", "stats": {...}} with only the changed fields,
+    # at most STATS_WS_MAX_UPDATES_PER_SECOND times per second.
     async def connect(self):
         await self.accept()
-        
+        # None until the snapshot is sent; updates before that are covered by the catch-up
+        self.last_sent = None
+
         # Get supabase_uid from query string
-        supabase_uid = self.scope['query_string'].decode().split('=')[1]
+        supabase_uid = parse_qs(self.scope['query_string'].decode()).get('supabase_uid', [None])[0]
         if supabase_uid:
             self.supabase_uid = supabase_uid
-            await self.channel_layer.group_add(
-                f"user_{supabase_uid}",
-                self.channel_name
-            )
-    
+            self.group_name = f"user_{supabase_uid}"
+            # Join before the first await so a concurrent disconnect can't tear the group down
+            fanout = group_fanouts.get(self.group_name)
+            if fanout is None:
+                fanout = GroupFanout(self.channel_layer, self.group_name, settings.STATS_WS_MAX_UPDATES_PER_SECOND)
+                group_fanouts[self.group_name] = fanout
+                fanout.members.add(self)
+                await fanout.start()
+            else:
+                fanout.members.add(self)
+
+            snapshot = await self.load_stats(supabase_uid)
+            self.last_sent = dict(snapshot)
+            await self.send_json({'type': 'snapshot', 'stats': snapshot})
+            # Catch up on anything newer than the database read; an older event in
+            # flight would move the counters backwards
+            if fanout.latest is not None and is_newer(fanout.latest, snapshot):
+                await self.send_stats(fanout.latest)
+
     async def disconnect(self, close_code):
         if hasattr(self, 'supabase_uid'):
-            await self.channel_layer.group_discard(
-                f"user_{self.supabase_uid}",
-                self.channel_name
-            )
-    
-    async def stats_update(self, event):
-        # Send stats update to WebSocket
-        await self.send_json(event['stats'])
\ No newline at end of file
+            fanout = group_fanouts.get(self.group_name)
+            if fanout is not None:
+                fanout.members.discard(self)
+                if not fanout.members:
+                    del group_fanouts[self.group_name]
+                    await fanout.stop()
+
+    @database_sync_to_async
+    def load_stats(self, supabase_uid):
+        stats = WasteStatistics.objects.filter(user__supabase_uid=supabase_uid).first()
+        return WasteStatisticsSerializer(stats).data if stats is not None else {}
+
+    async def send_stats(self, stats):
+        # Send only what changed since this connection's last message
+        if self.last_sent is None:
+            return
+        delta = stats_delta(self.last_sent, stats)
+        if delta:
+            self.last_sent.update(delta)
+            await self.send_json({'type': 'delta', 'stats': delta})
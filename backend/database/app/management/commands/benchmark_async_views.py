@@ -0,0 +1,80 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from app.models import User, WasteStatistics
+
+BENCH_UID_PREFIX = 'bench-async-'
+
+# Each mode mounts the app URLs at the root so the same paths hit sync or async views
+URLCONFS = {
+    'sync': 'app.urls',
+    'async': 'app.async_urls',
+}
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _dashboard_client(supabase_uid, requests, latencies, errors):
+    # AsyncClient drives requests through Django's ASGIHandler, like an ASGI server would
+    client = AsyncClient()
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get('/waste-statistics/', {'supabase_uid': supabase_uid})
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(response.status_code)
+
+
+async def _run(supabase_uids, clients, requests):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _dashboard_client(supabase_uids[i % len(supabase_uids)], requests, latencies, errors)
+        for i in range(clients)
+    ))
+    return time.perf_counter() - start, latencies, errors
+
+
+class Command(BaseCommand):
+    help = ('Compare requests/sec and tail latency of the sync and async dashboard views '
+            'with many concurrent clients, served through the ASGI handler')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100, help='Concurrent dashboard clients')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per client')
+        parser.add_argument('--users', type=int, default=20, help='Distinct users polled by the clients')
+
+    def handle(self, *args, **options):
+        clients, requests = options['clients'], options['requests']
+        run_id = uuid.uuid4().hex[:8]
+        supabase_uids = [f'{BENCH_UID_PREFIX}{run_id}-{i}' for i in range(options['users'])]
+        for supabase_uid in supabase_uids:
+            user = User.objects.create(supabase_uid=supabase_uid)
+            WasteStatistics.objects.create(user=user)
+
+        self.stdout.write(f"{clients} clients x {requests} requests on GET /api/waste-statistics/")
+        try:
+            for mode, urlconf in URLCONFS.items():
+                with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=['testserver'], DEBUG=False):
+                    elapsed, latencies, errors = asyncio.run(_run(supabase_uids, clients, requests))
+                self.stdout.write(
+                    f"{mode:>5}: {len(latencies) / elapsed:8.1f} req/s  "
+                    f"p50 {statistics.median(latencies) * 1000 if latencies else 0:7.2f} ms  "
+                    f"p95 {_percentile(latencies, 95) * 1000:7.2f} ms  "
+                    f"p99 {_percentile(latencies, 99) * 1000:7.2f} ms  "
+                    f"errors {len(errors)}"
+                )
+        finally:
+            User.objects.filter(supabase_uid__startswith=f'{BENCH_UID_PREFIX}{run_id}').delete()
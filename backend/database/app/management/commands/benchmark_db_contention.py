@@ -0,0 +1,136 @@
+import multiprocessing
+import statistics
+import time
+import uuid
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# Models are imported inside the workers: they run in spawned processes
+# (the only start method on Windows) and must call django.setup() first.
+
+BENCH_UID_PREFIX = 'bench-contention-'
+
+
+def _setup_django():
+    import os
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'database.settings')
+    django.setup()
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _writer(supabase_uid, duration, results):
+    # Mirrors WasteClassifier.update_stats: look the user up, then increment a counter
+    _setup_django()
+    from django.db import OperationalError
+    from app.models import CATEGORY_FIELDS, User, WasteStatistics
+
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        field_name = CATEGORY_FIELDS[i % len(CATEGORY_FIELDS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            user = User.objects.get(supabase_uid=supabase_uid)
+            WasteStatistics.record_detection(user, field_name)
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors += 1
+    results.put(('write', latencies, errors))
+
+
+def _reader(supabase_uids, duration, results):
+    # Mirrors dashboard clients polling GET /api/waste-statistics/
+    _setup_django()
+    from django.test import Client
+
+    client = Client(HTTP_HOST='localhost')
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        supabase_uid = supabase_uids[i % len(supabase_uids)]
+        i += 1
+        start = time.perf_counter()
+        response = client.get('/api/waste-statistics/', {'supabase_uid': supabase_uid})
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    results.put(('read', latencies, errors))
+
+
+class Command(BaseCommand):
+    help = ('Benchmark concurrent classifier-style writes and REST reads against the '
+            'configured database. Point SQLITE_PATH at a scratch copy of the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scratch', action='store_true',
+                            help='Confirm the configured database is a scratch copy; the benchmark writes '
+                                 'to it and rebuilds its global statistics')
+        parser.add_argument('--writers', type=int, default=4, help='Number of writer processes')
+        parser.add_argument('--readers', type=int, default=4, help='Number of reader processes')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+
+    def handle(self, *args, **options):
+        from django.db import connection
+        from app.models import User, WasteStatistics
+
+        if not options['scratch']:
+            raise CommandError(
+                f"Refusing to benchmark {connection.vendor} database {connection.settings_dict['NAME']}: it writes "
+                f"bench users and rebuilds the global statistics. Point SQLITE_PATH (or POSTGRES_DB) at a scratch "
+                f"copy and pass --scratch."
+            )
+
+        writers, readers, duration = options['writers'], options['readers'], options['duration']
+        run_id = uuid.uuid4().hex[:8]
+        supabase_uids = [f'{BENCH_UID_PREFIX}{run_id}-{i}' for i in range(max(writers, 1))]
+        for supabase_uid in supabase_uids:
+            user = User.objects.create(supabase_uid=supabase_uid)
+            WasteStatistics.objects.create(user=user)
+        # Never hand an open connection to child processes
+        connection.close()
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        processes = [ctx.Process(target=_writer, args=(supabase_uids[i], duration, results))
+                     for i in range(writers)]
+        processes += [ctx.Process(target=_reader, args=(supabase_uids, duration, results))
+                      for _ in range(readers)]
+
+        self.stdout.write(f"Running {writers} writers and {readers} readers for {duration:.0f}s "
+                          f"against {connection.settings_dict['NAME']}")
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        for kind in ('write', 'read'):
+            latencies = [l for k, samples, _ in collected if k == kind for l in samples]
+            errors = sum(e for k, _, e in collected if k == kind)
+            if not latencies and not errors:
+                continue
+            self.stdout.write(
+                f"{kind:>5}: {len(latencies) / duration:8.1f} ops/s  "
+                f"p50 {statistics.median(latencies) * 1000 if latencies else 0:7.2f} ms  "
+                f"p99 {_percentile(latencies, 99) * 1000:7.2f} ms  "
+                f"max {max(latencies, default=0) * 1000:7.2f} ms  "
+                f"errors {errors}"
+            )
+
+        # Global totals were incremented too, so rebuild them after deleting the bench rows
+        User.objects.filter(supabase_uid__startswith=f'{BENCH_UID_PREFIX}{run_id}').delete()
+        call_command('rebuild_global_statistics', stdout=self.stdout)
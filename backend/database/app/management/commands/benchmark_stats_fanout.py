@@ -0,0 +1,182 @@
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from app import consumers
+from app.consumers import StatsConsumer
+from app.models import User, WasteStatistics
+
+BENCH_UID_PREFIX = 'bench-ws-'
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class WebsocketClient(ApplicationCommunicator):
+    # Minimal in-process websocket client speaking ASGI directly to the consumer
+    # (channels.testing.WebsocketCommunicator would pull in daphne)
+    def __init__(self, application, supabase_uid):
+        super().__init__(application, {
+            'type': 'websocket',
+            'path': '/ws/stats/',
+            'query_string': f'supabase_uid={supabase_uid}'.encode(),
+            'headers': [],
+            'subprotocols': [],
+        })
+
+    async def connect(self, timeout=10):
+        await self.send_input({'type': 'websocket.connect'})
+        return (await self.receive_output(timeout))['type'] == 'websocket.accept'
+
+    async def receive_text(self, timeout=10):
+        return (await self.receive_output(timeout))['text']
+
+    async def disconnect(self, timeout=10):
+        await self.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.wait(timeout)
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def _client_reader(client, supabase_uid, sent_times, results):
+    # Records size and fanout latency of every message after the snapshot
+    while True:
+        message = await client.receive_text(timeout=3600)
+        payload = json.loads(message)
+        if payload['type'] != 'delta':
+            continue
+        results['messages'] += 1
+        results['bytes'] += len(message)
+        detection = payload['stats'].get('total')
+        if detection is not None:
+            results['latencies'].append(time.perf_counter() - sent_times[supabase_uid][detection])
+
+
+async def _publisher(supabase_uid, events_per_second, duration, sent_times):
+    # A bin flushing detections: one full stats event per detection, like the camera sends
+    channel_layer = get_channel_layer()
+    interval = 1.0 / events_per_second
+    start = time.perf_counter()
+    detection = 0
+    while time.perf_counter() - start < duration:
+        detection += 1
+        stats = {'paper': detection, 'glass': 0, 'food_organics': 0, 'metal': 0, 'cardboard': 0,
+                 'miscellaneous_trash': 0, 'total': detection, 'updated_at': timezone.now().isoformat()}
+        sent_times[supabase_uid][detection] = time.perf_counter()
+        await channel_layer.group_send(f"user_{supabase_uid}", {'type': 'stats.update', 'stats': stats})
+        await asyncio.sleep(max(0.0, start + detection * interval - time.perf_counter()))
+    return detection
+
+
+async def _run(supabase_uids, clients, events_per_second, duration):
+    rss_before = _rss_mb()
+    sent_times = {supabase_uid: {} for supabase_uid in supabase_uids}
+    results = {'messages': 0, 'bytes': 0, 'latencies': []}
+
+    application = StatsConsumer.as_asgi()
+    websockets = []
+    # Python heap held per connection; RSS alone hides it once earlier runs have grown the heap
+    tracemalloc.start()
+    connect_start = time.perf_counter()
+    for i in range(clients):
+        supabase_uid = supabase_uids[i % len(supabase_uids)]
+        client = WebsocketClient(application, supabase_uid)
+        assert await client.connect()
+        await client.receive_text()  # snapshot
+        websockets.append((client, supabase_uid))
+    connect_seconds = time.perf_counter() - connect_start
+    connection_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    readers = [asyncio.create_task(_client_reader(client, supabase_uid, sent_times, results))
+               for client, supabase_uid in websockets]
+    events = await asyncio.gather(*(
+        _publisher(supabase_uid, events_per_second, duration, sent_times) for supabase_uid in supabase_uids
+    ))
+    # Let the last coalesced flush go out
+    await asyncio.sleep(1.0)
+    rss_peak = _rss_mb()
+
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    for client, _ in websockets:
+        await client.disconnect()
+    return {
+        'events': sum(events),
+        'connect_seconds': connect_seconds,
+        'connection_bytes': connection_bytes,
+        'rss_before': rss_before,
+        'rss_peak': rss_peak,
+        **results,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Load-test the stats websocket with thousands of in-process clients on the in-memory '
+            'channel layer, with and without coalescing')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=2000, help='Simulated websocket connections')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Distinct users; the clients are spread over their groups like open tabs')
+        parser.add_argument('--events_per_second', type=float, default=20.0, help='Detection events per user')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds of events per mode')
+        parser.add_argument('--max_rates', type=float, nargs='+', default=[0.0, 2.0],
+                            help='STATS_WS_MAX_UPDATES_PER_SECOND values to compare (0 disables coalescing)')
+
+    def handle(self, *args, **options):
+        clients, duration = options['clients'], options['duration']
+        run_id = uuid.uuid4().hex[:8]
+        supabase_uids = [f'{BENCH_UID_PREFIX}{run_id}-{i}' for i in range(options['users'])]
+        for supabase_uid in supabase_uids:
+            user = User.objects.create(supabase_uid=supabase_uid)
+            WasteStatistics.objects.create(user=user)
+
+        self.stdout.write(f"{clients} clients over {len(supabase_uids)} users, "
+                          f"{options['events_per_second']:g} events/s per user for {duration:g}s")
+        layers = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+        try:
+            for max_rate in options['max_rates']:
+                with override_settings(CHANNEL_LAYERS=layers, STATS_WS_MAX_UPDATES_PER_SECOND=max_rate):
+                    result = asyncio.run(_run(supabase_uids, clients, options['events_per_second'], duration))
+                assert not consumers.group_fanouts
+                latencies = result['latencies']
+                label = 'unlimited' if max_rate <= 0 else f'{max_rate:g}/s'
+                self.stdout.write(
+                    f"max rate {label:>9}: {result['events']} events -> {result['messages']} messages "
+                    f"({result['messages'] / duration:9.1f} msg/s, {result['bytes'] / duration / 1024:8.1f} KiB/s)  "
+                    f"latency p50 {statistics.median(latencies) * 1000 if latencies else 0:7.1f} ms  "
+                    f"p95 {_percentile(latencies, 95) * 1000:7.1f} ms  "
+                    f"max {max(latencies, default=0) * 1000:7.1f} ms"
+                )
+                self.stdout.write(
+                    f"{'':>20}connect {result['connect_seconds']:.1f}s, "
+                    f"{result['connection_bytes'] / 1024 / clients:.1f} KiB heap per connection, "
+                    f"RSS {result['rss_before']:.0f} MB -> {result['rss_peak']:.0f} MB under load"
+                )
+        finally:
+            User.objects.filter(supabase_uid__startswith=f'{BENCH_UID_PREFIX}{run_id}').delete()
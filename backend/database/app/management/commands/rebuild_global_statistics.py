@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from app.models import CATEGORY_FIELDS, GlobalWasteStatistics, WasteStatistics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user totals and the global summary row from WasteStatistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of WasteStatistics rows processed per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        repaired = 0
+        last_pk = 0
+
+        while True:
+            # One short transaction per batch: on SQLite each transaction holds the
+            # database write lock, and the camera's increments queue up behind it
+            with transaction.atomic():
+                # Keyset pagination on pk keeps each batch query cheap
+                batch = list(
+                    WasteStatistics.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .only('pk', 'total', *CATEGORY_FIELDS)[:batch_size]
+                )
+                if not batch:
+                    break
+
+                stale = []
+                for stats in batch:
+                    row_total = sum(getattr(stats, field) for field in CATEGORY_FIELDS)
+                    if stats.total != row_total:
+                        stats.total = row_total
+                        stale.append(stats)
+
+                if stale:
+                    WasteStatistics.objects.bulk_update(stale, ['total'])
+                    repaired += len(stale)
+            last_pk = batch[-1].pk
+
+        # The totals are summed in the database at the end, inside the lock, so
+        # increments made while the batches ran are neither lost nor counted twice
+        with transaction.atomic():
+            GlobalWasteStatistics.load()
+            summary = GlobalWasteStatistics.objects.select_for_update().get(pk=GlobalWasteStatistics.SINGLETON_ID)
+            sums = WasteStatistics.objects.aggregate(**{field: Sum(field) for field in CATEGORY_FIELDS})
+            for field in CATEGORY_FIELDS:
+                setattr(summary, field, sums[field] or 0)
+            summary.total = sum(getattr(summary, field) for field in CATEGORY_FIELDS)
+            summary.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt global statistics: {summary.total} items, {repaired} user totals repaired"
+        ))
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-19 15:36
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+CATEGORY_FIELDS = ['paper', 'glass', 'food_organics', 'metal', 'cardboard', 'miscellaneous_trash']
+
+
+def backfill_totals(apps, schema_editor):
+    WasteStatistics = apps.get_model('app', 'WasteStatistics')
+    GlobalWasteStatistics = apps.get_model('app', 'GlobalWasteStatistics')
+
+    row_total = sum((F(field) for field in CATEGORY_FIELDS[1:]), F(CATEGORY_FIELDS[0]))
+    WasteStatistics.objects.update(total=row_total)
+
+    sums = WasteStatistics.objects.aggregate(**{field: Sum(field) for field in CATEGORY_FIELDS + ['total']})
+    GlobalWasteStatistics.objects.update_or_create(
+        pk=1, defaults={field: value or 0 for field, value in sums.items()}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_alter_user_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalWasteStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paper', models.BigIntegerField(default=0)),
+                ('glass', models.BigIntegerField(default=0)),
+                ('food_organics', models.BigIntegerField(default=0)),
+                ('metal', models.BigIntegerField(default=0)),
+                ('cardboard', models.BigIntegerField(default=0)),
+                ('miscellaneous_trash', models.BigIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='wastestatistics',
+            name='total',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
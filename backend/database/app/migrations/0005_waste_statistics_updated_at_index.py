@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-19 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_global_waste_statistics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wastestatistics',
+            index=models.Index(fields=['updated_at', 'id'], name='wastestats_updated_id_idx'),
+        ),
+    ]
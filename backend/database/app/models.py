@@ -1,6 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+# Per-category counter columns shared by WasteStatistics and GlobalWasteStatistics
+CATEGORY_FIELDS = ['paper', 'glass', 'food_organics', 'metal', 'cardboard', 'miscellaneous_trash']
+
 # Create your models here.
 class User(models.Model):
     supabase_uid = models.CharField(max_length=255, unique=True)
@@ -18,8 +23,52 @@ class WasteStatistics(models.Model):
     metal = models.IntegerField(default=0)
     cardboard = models.IntegerField(default=0)
     miscellaneous_trash = models.IntegerField(default=0)
+    # Sum of all category counters, indexed for the leaderboard
+    total = models.IntegerField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order of the statistics export
+            models.Index(fields=['updated_at', 'id'], name='wastestats_updated_id_idx'),
+        ]
+
     def __str__(self):
         return f"Waste Statistics for {self.user.email if self.user else 'Anonymous'}"
+
+    @classmethod
+    def record_detection(cls, user, field_name, count=1, refresh=False):
+        # Increment the user's counter and the global totals in one transaction.
+        # The rows almost always exist, so it's two UPDATEs; they are only created
+        # when an UPDATE matched nothing. Returns the user's stats if `refresh`.
+        increments = {field_name: F(field_name) + count, 'total': F('total') + count, 'updated_at': timezone.now()}
+        global_rows = GlobalWasteStatistics.objects.filter(pk=GlobalWasteStatistics.SINGLETON_ID)
+        with transaction.atomic():
+            if not cls.objects.filter(user=user).update(**increments):
+                cls.objects.create(user=user, total=count, **{field_name: count})
+            if not global_rows.update(**increments):
+                GlobalWasteStatistics.load()
+                global_rows.update(**increments)
+        return cls.objects.get(user=user) if refresh else None
+
+class GlobalWasteStatistics(models.Model):
+    # Single summary row holding fleet-wide totals across all users
+    SINGLETON_ID = 1
+
+    paper = models.BigIntegerField(default=0)
+    glass = models.BigIntegerField(default=0)
+    food_organics = models.BigIntegerField(default=0)
+    metal = models.BigIntegerField(default=0)
+    cardboard = models.BigIntegerField(default=0)
+    miscellaneous_trash = models.BigIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "Global Waste Statistics"
+
+    @classmethod
+    def load(cls):
+        obj, created = cls.objects.get_or_create(pk=cls.SINGLETON_ID)
+        return obj
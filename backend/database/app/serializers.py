@@ -1,6 +1,6 @@
 # app/serializers.py
 from rest_framework import serializers
-from .models import WasteStatistics, User
+from .models import WasteStatistics, GlobalWasteStatistics, User
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,3 +11,18 @@ class WasteStatisticsSerializer(serializers.ModelSerializer):
     class Meta:
         model = WasteStatistics
         fields = '__all__'  # Or specify the fields you need
+
+class GlobalWasteStatisticsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GlobalWasteStatistics
+        exclude = ['id']
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    # Public endpoint: never the user's email or supabase_uid. is_you marks the
+    # entry of the caller who passed their own supabase_uid.
+    rank = serializers.IntegerField()
+    is_you = serializers.BooleanField()
+
+    class Meta:
+        model = WasteStatistics
+        fields = ['rank', 'total', 'is_you']
@@ -1,3 +1,393 @@
+import contextlib
+import csv
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+# The camera-side modules live in backend/, next to the Django project
+sys.path.append(str(settings.BASE_DIR.parent))
+
+from frameCache import RecentItemCache, item_signature, signature_distance  # noqa: E402
+from statsJournal import StatsJournal  # noqa: E402
+
+from .consumers import GroupFanout, is_newer  # noqa: E402
+from .models import GlobalWasteStatistics, User, WasteStatistics  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecentItemCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_lookup_matches_within_max_distance(self):
+        cache = RecentItemCache(max_distance=2, clock=self.clock)
+        cache.store(0b1111, 'paper')
+        self.assertEqual(cache.lookup(0b1100), 'paper')
+        self.assertIsNone(cache.lookup(0b0000))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        cache = RecentItemCache(ttl=5.0, clock=self.clock)
+        cache.store(1, 'glass')
+        self.clock.now = 5.0
+        self.assertEqual(cache.lookup(1), 'glass')
+        self.clock.now = 5.1
+        self.assertIsNone(cache.lookup(1))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RecentItemCache(max_entries=2, max_distance=0, clock=self.clock)
+        cache.store(1, 'paper')
+        cache.store(2, 'glass')
+        # Looking up 1 makes 2 the least recently used
+        self.assertEqual(cache.lookup(1), 'paper')
+        cache.store(3, 'metal')
+        self.assertIsNone(cache.lookup(2))
+        self.assertEqual(cache.lookup(1), 'paper')
+        self.assertEqual(cache.lookup(3), 'metal')
+
+    def test_signature_tells_plain_items_apart_by_color_and_place(self):
+        frame = np.full((480, 640, 3), 100, dtype=np.uint8)
+        red, blue = frame.copy(), frame.copy()
+        red[120:360, 160:480] = (0, 0, 255)
+        blue[120:360, 160:480] = (255, 0, 0)
+        box = (160, 120, 320, 240)
+
+        # Both flat blocks have the same all-zero difference hash
+        self.assertEqual(item_signature(red, box)[0], item_signature(blue, box)[0])
+        self.assertEqual(signature_distance(item_signature(red, box), item_signature(red, box)), 0)
+        self.assertEqual(signature_distance(item_signature(red, box), item_signature(blue, box)), float('inf'))
+        self.assertEqual(signature_distance(item_signature(red, box), item_signature(red, (200, 120, 240, 240))),
+                         float('inf'))
+
+    def test_last_decision_cache_only_matches_the_same_item(self):
+        cache = RecentItemCache(max_entries=1, ttl=6.0, max_distance=4, clock=self.clock,
+                                distance=signature_distance)
+        first = (0, (160, 120, 320, 240), (0, 0, 255))
+        second = (0, (160, 120, 320, 240), (255, 0, 0))
+        cache.store(first, 'metal')
+        self.assertEqual(cache.lookup(first), 'metal')
+        self.assertIsNone(cache.lookup(second))
+        # A new decision replaces the previous item
+        cache.store(second, 'paper')
+        self.assertIsNone(cache.lookup(first))
+
+
+class StatsJournalTests(unittest.TestCase):
+    CATEGORIES = ['Paper', 'Glass', 'Metal']
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def open_journal(self, **kwargs):
+        return StatsJournal(self.directory.name, self.CATEGORIES, name='stats', **kwargs)
+
+    def test_records_reach_the_file_before_any_fsync(self):
+        journal = self.open_journal(fsync_every=100, fsync_interval=3600)
+        journal.record_detection('Paper')
+        journal.record_detection('Glass', 'uid-1')
+        # A process killed now (no close, no fsync) still leaves both records behind
+        restored = self.open_journal()
+        self.assertEqual(restored.stats, {'Paper': 1, 'Glass': 1, 'Metal': 0})
+        self.assertEqual([record['category'] for record in restored.pending.values()], ['Glass'])
+
+    def test_sync_if_due_fsyncs_after_the_interval(self):
+        journal = self.open_journal(fsync_every=100, fsync_interval=0.0)
+        journal.sync_if_due()
+        journal.record_detection('Paper')
+        self.assertEqual(journal.unsynced_writes, 0)
+        journal.fsync_interval = 3600
+        journal.record_detection('Paper')
+        self.assertEqual(journal.unsynced_writes, 1)
+
+    def test_torn_tail_is_ignored_and_cut_off(self):
+        journal = self.open_journal()
+        journal.record_detection('Paper')
+        journal.record_detection('Metal')
+        journal.sync()
+        with open(journal.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"type": "detection", "category": "Gla')
+
+        restored = self.open_journal()
+        self.assertEqual(restored.stats, {'Paper': 1, 'Glass': 0, 'Metal': 1})
+        # The next record starts on a fresh line instead of after the torn one
+        restored.record_detection('Glass')
+        self.assertEqual(self.open_journal().stats, {'Paper': 1, 'Glass': 1, 'Metal': 1})
+
+    def test_compaction_keeps_counts_and_pending_records(self):
+        journal = self.open_journal(compact_every=3)
+        journal.record_detection('Paper', 'uid-1')
+        journal.record_detection('Paper', 'uid-1')
+        journal.ack(1)
+        # The third record triggered compaction into the snapshot
+        self.assertEqual(os.path.getsize(journal.journal_path), 0)
+        journal.record_detection('Metal')
+
+        restored = self.open_journal()
+        self.assertEqual(restored.stats, {'Paper': 2, 'Glass': 0, 'Metal': 1})
+        self.assertEqual(sorted(restored.pending), [2])
+        self.assertEqual(restored.seq, 4)
+
+    def test_sync_pending_acks_in_order_and_stops_at_the_first_failure(self):
+        journal = self.open_journal()
+        for category in self.CATEGORIES:
+            journal.record_detection(category, 'uid-1')
+        synced = []
+
+        def sync_record(record):
+            if record['category'] == 'Glass':
+                raise ConnectionError('database down')
+            synced.append(record['category'])
+
+        with contextlib.redirect_stdout(StringIO()):
+            self.assertEqual(journal.sync_pending(sync_record), 1)
+        self.assertEqual(synced, ['Paper'])
+        self.assertEqual([record['category'] for record in self.open_journal().pending.values()], ['Glass', 'Metal'])
+
+
+class FakeSocket:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.received = []
+        self.closed = False
+
+    async def send_stats(self, stats):
+        if self.fail:
+            raise ConnectionResetError('peer went away')
+        self.received.append(stats)
+
+    async def close(self):
+        self.closed = True
+
+
+class GroupFanoutTests(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_send_drops_only_that_member(self):
+        fanout = GroupFanout(channel_layer=None, group='user_uid-1', max_rate=0)
+        healthy, broken = FakeSocket(), FakeSocket(fail=True)
+        fanout.members.update([healthy, broken])
+
+        with self.assertLogs('app.consumers', 'ERROR'):
+            await fanout.update({'total': 1})
+        await fanout.update({'total': 2})
+
+        self.assertEqual(healthy.received, [{'total': 1}, {'total': 2}])
+        self.assertEqual(fanout.members, {healthy})
+        self.assertTrue(broken.closed)
+
+
+class CatchUpTests(unittest.TestCase):
+    def test_only_events_after_the_snapshot_are_newer(self):
+        snapshot = {'total': 5, 'updated_at': '2026-01-01T12:00:00.500000Z'}
+        self.assertTrue(is_newer({'total': 6, 'updated_at': '2026-01-01T12:00:01Z'}, snapshot))
+        # Committed before the snapshot was read, but delivered after it
+        self.assertFalse(is_newer({'total': 4, 'updated_at': '2026-01-01T12:00:00Z'}, snapshot))
+        self.assertFalse(is_newer({'total': 5, 'updated_at': '2026-01-01T12:00:00.500000Z'}, snapshot))
+        # A user without statistics yet has an empty snapshot
+        self.assertTrue(is_newer({'total': 1, 'updated_at': '2026-01-01T12:00:00Z'}, {}))
+
+
+class GlobalStatisticsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = User.objects.create(supabase_uid='uid-alice', email='alice@example.com')
+        self.bob = User.objects.create(supabase_uid='uid-bob', email='bob@example.com')
+
+    def test_record_detection_increments_user_and_global_totals(self):
+        WasteStatistics.record_detection(self.alice, 'paper')
+        WasteStatistics.record_detection(self.alice, 'paper')
+        stats = WasteStatistics.record_detection(self.bob, 'glass', count=3, refresh=True)
+
+        self.assertEqual((stats.glass, stats.total), (3, 3))
+        alice_stats = WasteStatistics.objects.get(user=self.alice)
+        self.assertEqual((alice_stats.paper, alice_stats.total), (2, 2))
+        summary = GlobalWasteStatistics.load()
+        self.assertEqual((summary.paper, summary.glass, summary.metal, summary.total), (2, 3, 0, 5))
+
+    def test_record_detection_is_two_updates_once_the_rows_exist(self):
+        WasteStatistics.record_detection(self.alice, 'paper')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(WasteStatistics.record_detection(self.alice, 'paper'))
+        # Ignoring the savepoint the test case's own transaction wraps atomic() in
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEqual([sql for sql in statements if sql not in ('SAVEPOINT', 'RELEASE')], ['UPDATE', 'UPDATE'])
+        self.assertEqual(WasteStatistics.objects.get(user=self.alice).paper, 2)
+
+    def test_leaderboard_ranks_users_without_identifying_them(self):
+        WasteStatistics.record_detection(self.alice, 'metal')
+        WasteStatistics.record_detection(self.bob, 'metal', count=4)
+
+        response = self.client.get('/api/global-statistics/', {'top': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['metal'], 5)
+        self.assertEqual(response.json()['leaderboard'], [{'rank': 1, 'total': 4, 'is_you': False},
+                                                          {'rank': 2, 'total': 1, 'is_you': False}])
+        self.assertNotIn('you', response.json())
+
+    def test_leaderboard_marks_the_callers_own_rank(self):
+        WasteStatistics.record_detection(self.alice, 'metal')
+        WasteStatistics.record_detection(self.bob, 'metal', count=4)
+        carol = User.objects.create(supabase_uid='uid-carol')
+        WasteStatistics.record_detection(carol, 'paper', count=4)
+
+        response = self.client.get('/api/global-statistics/', {'top': 2, 'supabase_uid': 'uid-carol'})
+        # Carol ties with Bob and ranks after him, like the leaderboard order
+        self.assertEqual([entry['is_you'] for entry in response.json()['leaderboard']], [False, True])
+        self.assertEqual(response.json()['you'], {'rank': 2, 'total': 4, 'is_you': True})
+
+        response = self.client.get('/api/global-statistics/', {'top': 1, 'supabase_uid': 'uid-alice'})
+        self.assertEqual([entry['is_you'] for entry in response.json()['leaderboard']], [False])
+        self.assertEqual(response.json()['you'], {'rank': 3, 'total': 1, 'is_you': True})
+
+        response = self.client.get('/api/global-statistics/', {'supabase_uid': 'uid-nobody'})
+        self.assertIsNone(response.json()['you'])
+
+    def test_rebuild_repairs_user_totals_and_summary(self):
+        WasteStatistics.record_detection(self.alice, 'cardboard', count=2)
+        # Counters changed behind record_detection's back leave both totals stale
+        WasteStatistics.objects.filter(user=self.alice).update(paper=5)
+        WasteStatistics.objects.create(user=self.bob, glass=1)
+
+        call_command('rebuild_global_statistics', '--batch-size', '1', stdout=StringIO())
+
+        self.assertEqual(WasteStatistics.objects.get(user=self.alice).total, 7)
+        self.assertEqual(WasteStatistics.objects.get(user=self.bob).total, 1)
+        summary = GlobalWasteStatistics.load()
+        self.assertEqual((summary.paper, summary.glass, summary.cardboard, summary.total), (5, 1, 2, 8))
+
+
+class BulkUserUpsertTests(TestCase):
+    url = '/api/auth/users/bulk/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('admin', is_staff=True))
+        User.objects.create(supabase_uid='uid-existing', email='old@example.com')
+        User.objects.create(supabase_uid='uid-unchanged', email='same@example.com')
+
+    def test_requires_a_staff_account(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url, [{'supabase_uid': 'uid-existing', 'email': 'x@example.com'}],
+                                    format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(User.objects.get(supabase_uid='uid-existing').email, 'old@example.com')
+
+    def test_counts_created_and_updated_users(self):
+        response = self.client.post(self.url, {'users': [
+            {'supabase_uid': 'uid-new', 'email': 'new@example.com'},
+            {'supabase_uid': 'uid-existing', 'email': 'changed@example.com'},
+            {'supabase_uid': 'uid-unchanged', 'email': 'same@example.com'},
+            {'supabase_uid': 'uid-no-email'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'created': 2, 'updated': 1})
+        self.assertEqual(User.objects.get(supabase_uid='uid-existing').email, 'changed@example.com')
+        self.assertEqual(WasteStatistics.objects.filter(user__supabase_uid__startswith='uid-').count(), 4)
+
+    def test_accepts_a_bare_list(self):
+        response = self.client.post(self.url, [{'supabase_uid': 'uid-new'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'created': 1, 'updated': 0})
+
+    def test_rejects_a_body_that_is_not_a_list_of_records(self):
+        response = self.client.post(self.url, {'users': 'uid-new'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, [{'email': 'x@example.com'}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_reports_taken_emails_with_their_index(self):
+        response = self.client.post(self.url, [
+            {'supabase_uid': 'uid-new', 'email': 'fresh@example.com'},
+            {'supabase_uid': 'uid-thief', 'email': 'old@example.com'},
+            {'supabase_uid': 'uid-a', 'email': 'twice@example.com'},
+            {'supabase_uid': 'uid-b', 'email': 'twice@example.com'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([conflict['index'] for conflict in response.json()['conflicts']], [1, 2, 3])
+        self.assertFalse(User.objects.filter(supabase_uid='uid-new').exists())
+
+
+class WasteStatisticsExportTests(TestCase):
+    url = '/api/waste-statistics/export/'
+    START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('admin', is_staff=True))
+        # Hours after START at which each user's statistics were last updated; c and d tie
+        self.stats = {}
+        for name, hours in [('a', 0), ('b', 1), ('c', 2), ('d', 2), ('e', 3)]:
+            user = User.objects.create(supabase_uid=f'uid-{name}', email=f'{name}@example.com')
+            stats = WasteStatistics.objects.create(user=user, paper=hours)
+            # update() skips auto_now, so updated_at keeps the value set here
+            WasteStatistics.objects.filter(pk=stats.pk).update(updated_at=self.START + timedelta(hours=hours))
+            self.stats[name] = stats
+
+    def export(self, **params):
+        response = self.client.get(self.url, {'output': 'ndjson', **params})
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def uids(self, rows):
+        return [row['supabase_uid'] for row in rows]
+
+    def test_requires_a_staff_account(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_authenticate(get_user_model().objects.create_user('viewer'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_keyset_pages_cover_every_row_once_in_order(self):
+        pages, cursor = [], {}
+        while True:
+            rows = self.export(limit=2, **cursor)
+            if not rows:
+                break
+            pages.append(self.uids(rows))
+            cursor = {'after_updated_at': rows[-1]['updated_at'], 'after_id': rows[-1]['id']}
+
+        # The tie between c and d is broken by id, even across a page boundary
+        self.assertEqual(pages, [['uid-a', 'uid-b'], ['uid-c', 'uid-d'], ['uid-e']])
+        rows = self.export(after_updated_at=self.START + timedelta(hours=2), after_id=self.stats['c'].pk)
+        self.assertEqual(self.uids(rows), ['uid-d', 'uid-e'])
+
+    def test_updated_range_filters(self):
+        rows = self.export(updated_since=(self.START + timedelta(hours=1)).isoformat(),
+                           updated_before=(self.START + timedelta(hours=3)).isoformat())
+        self.assertEqual(self.uids(rows), ['uid-b', 'uid-c', 'uid-d'])
+        self.assertEqual(rows[0]['email'], 'b@example.com')
+        self.assertEqual(rows[0]['paper'], 1)
+
+    def test_csv_has_a_header_row(self):
+        response = self.client.get(self.url, {'updated_since': (self.START + timedelta(hours=3)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['supabase_uid'], row['total']) for row in rows], [('uid-e', '0')])
 
-# Create your tests here.
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'after_id': 1}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'updated_since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
@@ -1,10 +1,14 @@
 from django.urls import path
-from .views import WasteStatisticsView, UserAuthView, StartCameraView, StopCameraView
+from .views import WasteStatisticsView, UserAuthView, BulkUserUpsertView, StartCameraView, StopCameraView, CameraModelView, GlobalStatisticsView, WasteStatisticsExportView
 
 urlpatterns = [
     path('waste-statistics/', WasteStatisticsView.as_view(), name='waste-statistics'),
+    path('waste-statistics/export/', WasteStatisticsExportView.as_view(), name='waste-statistics-export'),
     path('waste-statistics/<int:pk>/', WasteStatisticsView.as_view(), name='waste-statistics-detail'),
+    path('global-statistics/', GlobalStatisticsView.as_view(), name='global-statistics'),
     path('auth/user/', UserAuthView.as_view(), name='user-auth'),
+    path('auth/users/bulk/', BulkUserUpsertView.as_view(), name='user-bulk-upsert'),
     path('start-camera/', StartCameraView.as_view(), name='start-camera'),
     path('stop-camera/', StopCameraView.as_view(), name='stop-camera'),
+    path('camera-model/', CameraModelView.as_view(), name='camera-model'),
 ]
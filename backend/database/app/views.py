@@ -2,14 +2,26 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import WasteStatistics, User
-from .serializers import WasteStatisticsSerializer, UserSerializer
+from rest_framework.permissions import IsAdminUser
+from .models import CATEGORY_FIELDS, WasteStatistics, GlobalWasteStatistics, User
+from .serializers import (
+    WasteStatisticsSerializer,
+    UserSerializer,
+    GlobalWasteStatisticsSerializer,
+    LeaderboardEntrySerializer,
+)
 import subprocess
 import sys
+import csv
+import json
 import os
 import signal
 import time
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 class StartCameraView(APIView):
@@ -85,6 +97,53 @@ class StopCameraView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
+def is_camera_process(pid):
+    # A stale pid file may name an unrelated process, which SIGHUP would terminate
+    if not os.path.isdir('/proc'):
+        return True  # Can't tell on this platform
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return b'cameraClassifier.py' in f.read()
+    except OSError:
+        return False
+
+
+class CameraModelView(APIView):
+    # Reports the camera process's active model and triggers an explicit hot reload
+    def get(self, request):
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        status_file = os.path.join(base_dir, '..', 'camera_model_status.json')
+        
+        if not os.path.exists(status_file):
+            return Response(
+                {"error": "No model status reported; is the camera running?"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        with open(status_file, 'r') as f:
+            return Response(json.load(f))
+
+    def post(self, request):
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        pid_file = os.path.join(base_dir, '..', 'camera_process.pid')
+        
+        if not hasattr(signal, 'SIGHUP'):
+            return Response(
+                {"error": "Explicit reload is not supported on this platform; replace the checkpoint file instead"},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        if not os.path.exists(pid_file):
+            return Response({"status": "Camera was not running"})
+        
+        try:
+            with open(pid_file, 'r') as f:
+                pid = int(f.read().strip())
+            if not is_camera_process(pid):
+                return Response({"status": "Camera was not running"})
+            os.kill(pid, signal.SIGHUP)
+            return Response({"status": "Model reload requested", "pid": pid})
+        except OSError:
+            return Response({"status": "Camera was not running"})
+        
 class UserAuthView(APIView):
     def post(self, request):
         supabase_uid = request.data.get('supabase_uid')
@@ -134,6 +193,125 @@ class UserAuthView(APIView):
             )
 
     
+class BulkUserUpsertView(APIView):
+    # Accepts {"users": [{"supabase_uid": ..., "email": ...}, ...]}, or just the list,
+    # for account syncs. It rewrites emails and reports which ones are taken, so
+    # like the export it is limited to staff accounts.
+    permission_classes = [IsAdminUser]
+    MAX_RECORDS = 10000
+    BATCH_SIZE = 500
+
+    def post(self, request):
+        data = request.data
+        records = data if isinstance(data, list) else data.get('users') if isinstance(data, dict) else None
+        
+        if not isinstance(records, list):
+            return Response(
+                {"error": "users must be a list of {supabase_uid, email} records"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(records) > self.MAX_RECORDS:
+            return Response(
+                {"error": f"At most {self.MAX_RECORDS} users can be upserted per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Later records win when the same supabase_uid appears more than once
+        emails = {}
+        indexes = {}
+        for index, record in enumerate(records):
+            supabase_uid = record.get('supabase_uid') if isinstance(record, dict) else None
+            if not supabase_uid:
+                return Response(
+                    {"error": f"supabase_uid is required (record {index})"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            emails[supabase_uid] = record.get('email')
+            indexes[supabase_uid] = index
+        
+        # Emails are unique, so a taken email is reported per record instead of
+        # failing the whole import on the constraint
+        conflicts = self._email_conflicts(emails, indexes)
+        if conflicts:
+            return Response(
+                {"error": "Email already belongs to another user", "conflicts": conflicts},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        created = updated = 0
+        supabase_uids = list(emails)
+        try:
+            with transaction.atomic():
+                for start in range(0, len(supabase_uids), self.BATCH_SIZE):
+                    batch = supabase_uids[start:start + self.BATCH_SIZE]
+                    batch_created, batch_updated = self._upsert_batch(batch, emails)
+                    created += batch_created
+                    updated += batch_updated
+            
+            return Response({"created": created, "updated": updated})
+        except IntegrityError as e:
+            # Another request took one of the emails since the check above
+            return Response(
+                {"error": f"Failed to upsert users: {str(e)}"},
+                status=status.HTTP_409_CONFLICT
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to upsert users: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def _email_conflicts(self, emails, indexes):
+        # Records whose email is held by a different user, or requested for several users
+        requested = {}
+        for supabase_uid, email in emails.items():
+            if email:
+                requested.setdefault(email, []).append(supabase_uid)
+        
+        owners = {}
+        addresses = list(requested)
+        for start in range(0, len(addresses), self.BATCH_SIZE):
+            owners.update(
+                User.objects.filter(email__in=addresses[start:start + self.BATCH_SIZE])
+                .values_list('email', 'supabase_uid')
+            )
+        
+        conflicts = []
+        for email, supabase_uids in requested.items():
+            for supabase_uid in supabase_uids:
+                if len(supabase_uids) > 1 or owners.get(email, supabase_uid) != supabase_uid:
+                    conflicts.append({"index": indexes[supabase_uid], "supabase_uid": supabase_uid, "email": email})
+        return sorted(conflicts, key=lambda conflict: conflict["index"])
+
+    def _upsert_batch(self, batch, emails):
+        existing = dict(User.objects.filter(supabase_uid__in=batch).values_list('supabase_uid', 'email'))
+        
+        # Match UserAuthView: a missing email never clears the stored one
+        with_email = [User(supabase_uid=uid, email=emails[uid]) for uid in batch if emails[uid]]
+        without_email = [User(supabase_uid=uid, email=None) for uid in batch if not emails[uid]]
+        if with_email:
+            User.objects.bulk_create(
+                with_email,
+                update_conflicts=True,
+                unique_fields=['supabase_uid'],
+                update_fields=['email'],
+            )
+        if without_email:
+            User.objects.bulk_create(without_email, ignore_conflicts=True)
+        
+        # Create zeroed statistics for every user in the batch that has none yet
+        missing_stats = User.objects.filter(
+            supabase_uid__in=batch, waste_statistics__isnull=True
+        ).values_list('id', flat=True)
+        WasteStatistics.objects.bulk_create(
+            [WasteStatistics(user_id=user_id) for user_id in missing_stats]
+        )
+        
+        created = sum(1 for uid in batch if uid not in existing)
+        updated = sum(1 for uid in batch if uid in existing and emails[uid] and existing[uid] != emails[uid])
+        return created, updated
+
+    
 class WasteStatisticsView(APIView):
     def get(self, request):
         supabase_uid = request.query_params.get('supabase_uid')
@@ -172,3 +350,166 @@ class WasteStatisticsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+class GlobalStatisticsView(APIView):
+    # The leaderboard carries no identifiers. A client passing its own supabase_uid
+    # gets its entry flagged with is_you, and its rank under "you" even when it is
+    # outside the top N (null if it has no statistics yet).
+    MAX_TOP = 100
+
+    def get(self, request):
+        try:
+            top = int(request.query_params.get('top', 10))
+        except ValueError:
+            return Response(
+                {"error": "top must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        top = max(0, min(top, self.MAX_TOP))
+        
+        try:
+            # Totals come from the incrementally maintained summary row
+            summary = GlobalWasteStatistics.load()
+            
+            # Leaderboard walks the index on total instead of aggregating
+            leaders = list(
+                WasteStatistics.objects.filter(user__isnull=False)
+                .only('pk', 'total')
+                .order_by('-total', 'pk')[:top]
+            )
+            
+            supabase_uid = request.query_params.get('supabase_uid')
+            caller = None
+            if supabase_uid:
+                caller = WasteStatistics.objects.filter(user__supabase_uid=supabase_uid).only('pk', 'total').first()
+            for rank, stats in enumerate(leaders, start=1):
+                stats.rank = rank
+                stats.is_you = caller is not None and stats.pk == caller.pk
+            
+            data = {
+                "totals": GlobalWasteStatisticsSerializer(summary).data,
+                "leaderboard": LeaderboardEntrySerializer(leaders, many=True).data,
+            }
+            if supabase_uid:
+                if caller is not None:
+                    # Same order as the leaderboard: higher total first, ties by pk
+                    caller.rank = next((stats.rank for stats in leaders if stats.is_you), None) or (
+                        WasteStatistics.objects.filter(user__isnull=False)
+                        .filter(Q(total__gt=caller.total) | Q(total=caller.total, pk__lt=caller.pk))
+                        .count() + 1
+                    )
+                    caller.is_you = True
+                data["you"] = LeaderboardEntrySerializer(caller).data if caller is not None else None
+            return Response(data)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to get global statistics: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class EchoBuffer:
+    # File-like object for csv.writer that hands back each row instead of storing it
+    def write(self, value):
+        return value
+
+
+class WasteStatisticsExportView(APIView):
+    # Streams every user's statistics as CSV or NDJSON, oldest update first.
+    # Incremental pulls pass the last row's updated_at and id back as
+    # after_updated_at/after_id, which resumes right after it (keyset pagination).
+    # Rows carry emails and Supabase ids, so only staff accounts may pull them
+    # (HTTP basic or session auth, e.g. curl -u admin).
+    permission_classes = [IsAdminUser]
+    EXPORT_FIELDS = ['id', 'supabase_uid', 'email'] + CATEGORY_FIELDS + ['total', 'created_at', 'updated_at']
+    CHUNK_SIZE = 2000  # Rows fetched per database round trip
+    ROWS_PER_WRITE = 500  # Rows joined into each chunk of the response body
+
+    def parse_datetime_param(self, request, name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"{name} must be an ISO 8601 datetime")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response(
+                {"error": "output must be csv or ndjson"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            updated_since = self.parse_datetime_param(request, 'updated_since')
+            updated_before = self.parse_datetime_param(request, 'updated_before')
+            after_updated_at = self.parse_datetime_param(request, 'after_updated_at')
+            after_id = request.query_params.get('after_id')
+            after_id = int(after_id) if after_id is not None else None
+            limit = request.query_params.get('limit')
+            limit = int(limit) if limit is not None else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if (after_updated_at is None) != (after_id is None):
+            return Response(
+                {"error": "after_updated_at and after_id must be given together"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit is not None and limit <= 0:
+            return Response({"error": "limit must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # One LEFT JOIN with the user table, ordered by the (updated_at, id) index so
+        # every page is a range scan. Plain tuples skip model instantiation per row.
+        queryset = (
+            WasteStatistics.objects
+            .values_list('id', 'user__supabase_uid', 'user__email', *CATEGORY_FIELDS, 'total', 'created_at', 'updated_at')
+            .order_by('updated_at', 'id')
+        )
+        if updated_since is not None:
+            queryset = queryset.filter(updated_at__gte=updated_since)
+        if updated_before is not None:
+            queryset = queryset.filter(updated_at__lt=updated_before)
+        if after_id is not None:
+            # (updated_at, id) > cursor, written so the index can seek to updated_at
+            queryset = queryset.filter(updated_at__gte=after_updated_at).exclude(
+                updated_at=after_updated_at, id__lte=after_id
+            )
+        if limit is not None:
+            queryset = queryset[:limit]
+        
+        if output == 'csv':
+            response = StreamingHttpResponse(self.stream_csv(queryset), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="waste_statistics.csv"'
+        else:
+            response = StreamingHttpResponse(self.stream_ndjson(queryset), content_type='application/x-ndjson')
+        return response
+
+    def export_rows(self, queryset):
+        # iterator() streams rows from the cursor instead of caching the whole result
+        for values in queryset.iterator(chunk_size=self.CHUNK_SIZE):
+            row = dict(zip(self.EXPORT_FIELDS, values))
+            row['created_at'] = row['created_at'].isoformat()
+            row['updated_at'] = row['updated_at'].isoformat()
+            yield row
+
+    def batched(self, lines):
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= self.ROWS_PER_WRITE:
+                yield ''.join(batch)
+                batch = []
+        if batch:
+            yield ''.join(batch)
+
+    def stream_csv(self, queryset):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(self.EXPORT_FIELDS)
+        yield from self.batched(
+            writer.writerow([row[field] for field in self.EXPORT_FIELDS]) for row in self.export_rows(queryset)
+        )
+
+    def stream_ndjson(self, queryset):
+        yield from self.batched(json.dumps(row) + '\n' for row in self.export_rows(queryset))
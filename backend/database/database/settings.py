@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -77,16 +78,69 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'database.wsgi.application'
 
+# Serve the dashboard endpoints with async ORM views. Enable when running under an
+# ASGI server (e.g. DJANGO_ASYNC_VIEWS=1 uvicorn database.asgi:application); under
+# WSGI the sync views avoid an async_to_sync hop per request.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '0') == '1'
+
+# Channel layer for the stats websocket (app/consumers.py). The in-memory layer
+# only reaches consumers in the same process.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Upper bound on stats websocket messages per second per user group; bursts of
+# detections in between are coalesced into one delta. 0 sends every update.
+STATS_WS_MAX_UPDATES_PER_SECOND = float(os.environ.get('STATS_WS_MAX_UPDATES_PER_SECOND', '2'))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The camera subprocess (cameraClassifier.py) and the web server write to the
+# same database concurrently. SQLite runs in WAL mode so readers never block the
+# writer, with a busy timeout and IMMEDIATE transactions so concurrent writers
+# queue up instead of failing with "database is locked". The journal mode is
+# stored in the file; the checked-in db.sqlite3 is already in WAL mode, so
+# opening it doesn't modify it.
+# Set DATABASE_ENGINE=postgresql (plus the POSTGRES_* variables) to switch backends.
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite3')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'smartbin'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a connection waits on a lock before raising
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+                # Take the write lock up front so read-then-write transactions don't deadlock
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
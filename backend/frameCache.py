@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def perceptual_hash(image, hash_size=8):
+    # Difference hash: compare neighbouring pixels of a tiny grayscale thumbnail
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = resized[:, 1:] > resized[:, :-1]
+    return int.from_bytes(np.packbits(diff.flatten()).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def item_signature(frame, box):
+    # The dHash of a low-texture item is close to 0, so the bounding box and the
+    # mean color are part of the signature to keep different items apart
+    x, y, w, h = box
+    roi = frame[y:y + h, x:x + w]
+    return perceptual_hash(roi), (x, y, w, h), tuple(int(c) for c in cv2.mean(roi)[:3])
+
+
+def signature_distance(a, b, max_offset=16, max_color_delta=24):
+    # Hash distance of two item signatures; infinite if the items moved, resized or differ in color
+    (hash_a, box_a, color_a), (hash_b, box_b, color_b) = a, b
+    if any(abs(p - q) > max_offset for p, q in zip(box_a, box_b)):
+        return float('inf')
+    if any(abs(p - q) > max_color_delta for p, q in zip(color_a, color_b)):
+        return float('inf')
+    return hamming_distance(hash_a, hash_b)
+
+
+class RecentItemCache:
+    """Bounded LRU/TTL cache of recent classification decisions keyed on a frame hash.
+
+    `distance` compares two keys; the closest entry within `max_distance` is a hit.
+    """
+
+    def __init__(self, max_entries=32, ttl=30.0, max_distance=10, clock=time.monotonic, distance=hamming_distance):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.clock = clock
+        self.distance = distance
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict_expired(self, now):
+        # Lookups reorder entries for LRU, so expiry has to check every entry
+        expired = [key for key, (_, stored_at) in self.entries.items() if now - stored_at > self.ttl]
+        for key in expired:
+            del self.entries[key]
+
+    def lookup(self, frame_hash):
+        now = self.clock()
+        self._evict_expired(now)
+
+        best_key = None
+        best_distance = self.max_distance + 1
+        for key in self.entries:
+            distance = self.distance(key, frame_hash)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(best_key)
+        self.hits += 1
+        return self.entries[best_key][0]
+
+    def store(self, frame_hash, decision):
+        now = self.clock()
+        self.entries[frame_hash] = (decision, now)
+        self.entries.move_to_end(frame_hash)
+        self._evict_expired(now)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
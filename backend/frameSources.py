@@ -0,0 +1,168 @@
+import glob
+import os
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+
+class FrameSource(ABC):
+    """Frame producer with the cv2.VideoCapture read/isOpened/release interface.
+
+    `timestamp()` is the media time of the last frame in seconds, so recorded
+    footage can be replayed faster than real time while cooldowns still see
+    the original spacing between items.
+    """
+
+    realtime = False
+
+    def __init__(self, fps=30.0):
+        self.fps = fps
+        self.frame_index = 0
+
+    def isOpened(self):
+        return True
+
+    @abstractmethod
+    def read(self):
+        """Return (ret, frame) like cv2.VideoCapture.read; ret is False once the source is exhausted."""
+
+    def timestamp(self):
+        return self.frame_index / self.fps
+
+    def drain(self):
+        # Recorded footage has no capture queue; see CameraSource.drain
+        pass
+
+    def release(self):
+        pass
+
+
+def drain_queued_frames(cap, fps, max_frames=8):
+    """Grab and drop the frames a capture driver queued while nobody was reading.
+
+    Queued frames come back at once; the first grab that has to wait for the
+    sensor is a current frame. Returns True when that frame has been grabbed and
+    is ready for retrieve().
+    """
+    for _ in range(max_frames):
+        start = time.perf_counter()
+        if not cap.grab():
+            return False
+        if time.perf_counter() - start >= 0.5 / fps:
+            return True
+    return True
+
+
+class CameraSource(FrameSource):
+    realtime = True
+
+    def __init__(self, device=0):
+        self.cap = cv2.VideoCapture(device)
+        # Not every backend honours a one-frame queue, so drain() still checks
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.grabbed = False
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        if self.grabbed:
+            self.grabbed = False
+            ret, frame = self.cap.retrieve()
+        else:
+            ret, frame = self.cap.read()
+        if ret:
+            self.frame_index += 1
+        return ret, frame
+
+    def drain(self):
+        # The driver keeps filling its buffers while the loop sleeps, so the next
+        # read() would return a frame from before the sleep
+        self.grabbed = drain_queued_frames(self.cap, self.fps)
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.frame_index += 1
+        return ret, frame
+
+    def timestamp(self):
+        position = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        return position / 1000 if position > 0 else super().timestamp()
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    EXTENSIONS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+    def __init__(self, directory, fps=30.0):
+        super().__init__(fps)
+        self.paths = sorted(p for ext in self.EXTENSIONS for p in glob.glob(os.path.join(directory, ext)))
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        while self.frame_index < len(self.paths):
+            frame = cv2.imread(self.paths[self.frame_index])
+            self.frame_index += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+
+class SyntheticSource(FrameSource):
+    """Static noisy background with a block-shaped "item" passing every `period` frames."""
+
+    def __init__(self, num_frames=3000, width=640, height=480, fps=30.0, period=90, item_frames=30, seed=0):
+        super().__init__(fps)
+        self.num_frames = num_frames
+        self.period = period
+        self.item_frames = item_frames
+        self.seed = seed
+        self.background = np.random.default_rng(seed).integers(90, 110, (height, width, 3), dtype=np.uint8)
+
+    def read(self):
+        if self.frame_index >= self.num_frames:
+            return False, None
+        item, phase = divmod(self.frame_index, self.period)
+        self.frame_index += 1
+
+        frame = self.background.copy()
+        if phase < self.item_frames:
+            # Color depends only on the item number, so frame_index can be seeked
+            color = tuple(int(c) for c in np.random.default_rng((self.seed, item)).integers(0, 256, 3))
+            height, width = frame.shape[:2]
+            cv2.rectangle(frame, (width // 4, height // 4), (3 * width // 4, 3 * height // 4), color, -1)
+        return True, frame
+
+
+def open_frame_source(spec, fps=30.0):
+    """Build a source from a CLI spec: camera[:index], video:<path>, images:<dir> or synthetic[:frames]."""
+    kind, _, arg = spec.partition(':')
+    if kind == 'camera':
+        return CameraSource(int(arg) if arg else 0)
+    if kind == 'video':
+        return VideoFileSource(arg)
+    if kind == 'images':
+        return ImageDirectorySource(arg, fps=fps)
+    if kind == 'synthetic':
+        return SyntheticSource(num_frames=int(arg) if arg else 3000, fps=fps)
+    raise ValueError(f"Unknown frame source '{spec}'")
@@ -0,0 +1,349 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import torch
+import torch.nn as nn
+from torchvision import models
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+# Private copies of loaded checkpoints; the live weights are memory-mapped from here
+CHECKPOINT_CACHE_DIR = os.path.join(current_dir, 'checkpoint_cache')
+
+COMPACT_DTYPES = {'fp16': torch.float16, 'bf16': torch.bfloat16}
+
+
+def build_model(num_classes):
+    # Same architecture as classificationModel.create_model, without pretrained weights
+    model = models.resnet50(weights=None)
+    num_features = model.fc.in_features
+    model.fc = nn.Sequential(
+        nn.Linear(num_features, 512),
+        nn.ReLU(),
+        nn.Dropout(0.5),
+        nn.Linear(512, num_classes)
+    )
+    return model
+
+
+def match_checkpoint_shapes(model, state_dict):
+    # Channel-pruned checkpoints (see modelPruning) have narrower layers than the
+    # stock ResNet-50; rebuild every layer whose checkpoint weight has another shape
+    for name, module in list(model.named_modules()):
+        weight = state_dict.get(f'{name}.weight')
+        if weight is None or getattr(module, 'weight', None) is None or module.weight.shape == weight.shape:
+            continue
+        if isinstance(module, nn.Conv2d):
+            resized = nn.Conv2d(weight.shape[1] * module.groups, weight.shape[0], module.kernel_size, module.stride,
+                                module.padding, module.dilation, module.groups, module.bias is not None)
+        elif isinstance(module, nn.BatchNorm2d):
+            resized = nn.BatchNorm2d(weight.shape[0], module.eps, module.momentum)
+        elif isinstance(module, nn.Linear):
+            resized = nn.Linear(weight.shape[1], weight.shape[0], module.bias is not None)
+        else:
+            continue
+        parent_name, _, attr = name.rpartition('.')
+        setattr(model.get_submodule(parent_name), attr, resized)
+    return model
+
+
+def load_model_eager(model_path, num_classes, device):
+    # Original loading path: random init, then a second full copy from torch.load
+    state_dict = torch.load(model_path, map_location=device)
+    model = match_checkpoint_shapes(build_model(num_classes), state_dict)
+    model.load_state_dict(state_dict)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def private_checkpoint_copy(model_path, cache_dir=CHECKPOINT_CACHE_DIR, keep=3):
+    """Copy a checkpoint to a file named after its content and return that path.
+
+    Memory-mapped parameters stay backed by the file they were loaded from. Mapping
+    this private copy instead of the deploy path means a deploy can overwrite,
+    truncate or replace the checkpoint (cp, scp, torch.save) without changing or
+    crashing a running model. Copies are never modified once written; all but the
+    `keep` most recent are removed.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    digest = hashlib.sha256()
+    try:
+        with open(model_path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            for chunk in iter(lambda: src.read(1 << 20), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+        path = os.path.join(cache_dir, f'{digest.hexdigest()[:16]}.pth')
+        if os.path.exists(path):
+            # Already cached, and possibly mapped by another camera: leave it alone
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # Touch so the copy in use counts as recent when pruning
+    os.utime(path)
+
+    copies = sorted((entry for entry in os.scandir(cache_dir) if entry.name.endswith('.pth')),
+                    key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in copies[keep:]:
+        try:
+            # Processes still mapping a removed copy keep their pages (on Windows
+            # the removal fails while it is mapped)
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+def load_model_lowmem(model_path, num_classes, device):
+    # Build the module on the meta device so no weights are allocated, then let the
+    # parameters point straight at a memory-mapped private copy of the checkpoint.
+    # Compact fp16/bf16 checkpoints are upcast to fp32 one tensor at a time.
+    state_dict = torch.load(private_checkpoint_copy(model_path), map_location='cpu', mmap=True, weights_only=True)
+    with torch.device('meta'):
+        model = match_checkpoint_shapes(build_model(num_classes), state_dict)
+    for name, tensor in state_dict.items():
+        if tensor.dtype in COMPACT_DTYPES.values():
+            state_dict[name] = tensor.float()
+    model.load_state_dict(state_dict, assign=True)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def save_checkpoint_atomic(state_dict, path):
+    # Write to a temp file and rename, so a hot-reloading camera never reads a
+    # half-written checkpoint
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            torch.save(state_dict, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def promote_checkpoint(candidate_path, deploy_path):
+    # Install a finished checkpoint at the path running cameras watch, in one rename
+    directory = os.path.dirname(os.path.abspath(deploy_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as dst, open(candidate_path, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, deploy_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def compact_checkpoint(src_path, dst_path, dtype='fp16'):
+    state_dict = torch.load(src_path, map_location='cpu', weights_only=True)
+    compact = {
+        name: tensor.to(COMPACT_DTYPES[dtype]) if tensor.is_floating_point() else tensor
+        for name, tensor in state_dict.items()
+    }
+    save_checkpoint_atomic(compact, dst_path)
+    return os.path.getsize(src_path), os.path.getsize(dst_path)
+
+
+def checkpoint_signature(*paths):
+    # Cheap change detection for polling: size and mtime of every file
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def checkpoint_version(*paths):
+    # Short content hash identifying the active model, as reported to the API
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def validate_model(model, num_classes, device):
+    # A checkpoint is accepted only if a warm-up forward pass produces finite logits
+    # of the right shape; this also pages in mmap'd weights before the swap
+    with torch.no_grad():
+        outputs = model(torch.zeros(1, 3, 224, 224, device=device))
+    if outputs.shape != (1, num_classes):
+        raise ValueError(f"expected output shape (1, {num_classes}), got {tuple(outputs.shape)}")
+    if not torch.isfinite(outputs).all():
+        raise ValueError("model produced non-finite outputs")
+
+
+class CheckpointReloader:
+    """Rebuilds the classifier on a background thread when its checkpoint changes.
+
+    The thread polls the checkpoint and categories files every `poll_interval`
+    seconds (0 disables polling) or reloads when `request()` is called. A new model
+    is loaded, warmed up and validated off the inference thread, then parked until
+    the camera loop picks it up with `take()` between frames. A model that fails
+    validation is discarded and the current one stays active.
+
+    Training never writes `model_path`; a finished model reaches it through
+    `promote_checkpoint`.
+    """
+
+    def __init__(self, model_path, categories_path, device, poll_interval=5.0):
+        self.model_path = model_path
+        self.categories_path = categories_path
+        self.device = device
+        self.poll_interval = poll_interval
+        self.signature = checkpoint_signature(model_path, categories_path)
+        self.version = checkpoint_version(model_path, categories_path)
+        self.rejected_signature = None
+        self.last_reload_seconds = None
+        self.last_error = None
+
+        self.lock = threading.Lock()
+        self.staged = None
+        self.requested = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='checkpoint-reloader', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def request(self):
+        # Safe to call from a signal handler
+        self.requested.set()
+
+    def take(self):
+        # Returns (model, categories, version) once a validated model is ready
+        with self.lock:
+            staged, self.staged = self.staged, None
+        return staged
+
+    def _run(self):
+        while True:
+            forced = self.requested.wait(self.poll_interval if self.poll_interval > 0 else None)
+            self.requested.clear()
+            try:
+                signature = checkpoint_signature(self.model_path, self.categories_path)
+            except OSError:
+                # Mid-replace or temporarily missing; try again on the next poll
+                continue
+            if not forced and signature in (self.signature, self.rejected_signature):
+                continue
+            self._reload(signature)
+
+    def _reload(self, signature):
+        start = time.perf_counter()
+        try:
+            categories = torch.load(self.categories_path)
+            model = load_model_lowmem(self.model_path, len(categories), self.device)
+            validate_model(model, len(categories), self.device)
+            version = checkpoint_version(self.model_path, self.categories_path)
+        except Exception as e:
+            self.rejected_signature = signature
+            self.last_error = str(e)
+            print(f"Model reload failed, keeping version {self.version}: {e}")
+            return
+
+        self.signature = signature
+        self.version = version
+        self.last_reload_seconds = time.perf_counter() - start
+        self.last_error = None
+        with self.lock:
+            self.staged = (model, categories, version)
+        print(f"Model version {version} ready after {self.last_reload_seconds:.2f}s")
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure_load(loader_name, model_path, num_classes, results):
+    loader = {'eager': load_model_eager, 'lowmem': load_model_lowmem}[loader_name]
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    model = loader(model_path, num_classes, torch.device('cpu'))
+    elapsed = time.perf_counter() - start
+    peak_load = peak_rss_mb()
+    # mmap'd weights are paged in lazily, so also compare after the first inference
+    with torch.no_grad():
+        model(torch.zeros(1, 3, 224, 224))
+    results.put((elapsed, baseline, peak_load, peak_rss_mb()))
+
+
+def benchmark(model_path, categories_path):
+    num_classes = len(torch.load(categories_path))
+    compact_path = os.path.splitext(model_path)[0] + '.fp16.pth'
+    compact_checkpoint(model_path, compact_path, 'fp16')
+
+    cases = [
+        ('eager', model_path, 'eager load (random init + torch.load)'),
+        ('lowmem', model_path, 'meta device + mmap + assign'),
+        ('lowmem', compact_path, 'meta device + mmap, fp16 on disk'),
+    ]
+    # Each case runs in a fresh process so peak RSS isn't polluted by earlier loads
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'strategy':<40} {'file MB':>8} {'load s':>8} {'load peak +MB':>14} {'inference peak +MB':>19}")
+    for loader_name, path, label in cases:
+        results = ctx.Queue()
+        process = ctx.Process(target=_measure_load, args=(loader_name, path, num_classes, results))
+        process.start()
+        elapsed, baseline, peak_load, peak_infer = results.get()
+        process.join()
+        size = os.path.getsize(path) / 1024 / 1024
+        # Peak RSS is reported relative to the process RSS just before loading
+        if baseline is None or peak_load is None:
+            print(f"{label:<40} {size:8.1f} {elapsed:8.2f} {'n/a':>14} {'n/a':>19}")
+        else:
+            print(f"{label:<40} {size:8.1f} {elapsed:8.2f} {peak_load - baseline:14.1f} {peak_infer - baseline:19.1f}")
+    os.remove(compact_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Low-memory checkpoint tools for the waste classifier')
+    parser.add_argument('--model', type=str, default='best_waste_classifier.pth', help='Checkpoint path')
+    parser.add_argument('--categories', type=str, default='waste_categories.pth', help='Categories path')
+    parser.add_argument('--compact', choices=sorted(COMPACT_DTYPES), help='Write a compact copy of the checkpoint')
+    parser.add_argument('--output', type=str, help='Output path for --compact')
+    parser.add_argument('--benchmark', action='store_true', help='Compare load time and peak RSS of each loader')
+    parser.add_argument('--promote', type=str, metavar='CHECKPOINT',
+                        help='Deploy CHECKPOINT as --model; running cameras hot-reload it')
+    args = parser.parse_args()
+
+    model_path = os.path.join(current_dir, args.model)
+    if args.promote:
+        promote_checkpoint(args.promote, model_path)
+        print(f"Promoted {args.promote} to {model_path}")
+    if args.compact:
+        output = args.output or os.path.splitext(model_path)[0] + f'.{args.compact}.pth'
+        before, after = compact_checkpoint(model_path, output, args.compact)
+        print(f"Wrote {output}: {before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB")
+    if args.benchmark:
+        benchmark(model_path, os.path.join(current_dir, args.categories))
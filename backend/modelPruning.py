@@ -0,0 +1,115 @@
+import statistics
+import time
+
+import torch
+import torch.nn as nn
+from torchvision.models.resnet import Bottleneck
+
+
+def count_flops(model, image_size=224):
+    # Multiply-accumulates of one forward pass, counted from conv and linear layers
+    macs = []
+
+    def conv_hook(module, inputs, output):
+        kernel = module.weight[0].numel()  # in_channels / groups * kh * kw
+        macs.append(output.numel() * kernel)
+
+    def linear_hook(module, inputs, output):
+        macs.append(output.numel() * module.in_features)
+
+    handles = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            handles.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            handles.append(module.register_forward_hook(linear_hook))
+    device = next(model.parameters()).device
+    was_training = model.training
+    model.eval()
+    with torch.no_grad():
+        model(torch.zeros(1, 3, image_size, image_size, device=device))
+    model.train(was_training)
+    for handle in handles:
+        handle.remove()
+    return sum(macs)
+
+
+def measure_latency(model, runs=20, warmup=3, image_size=224):
+    # Median single-image latency in milliseconds, the way the camera loop runs it
+    device = next(model.parameters()).device
+    was_training = model.training
+    model.eval()
+    image = torch.zeros(1, 3, image_size, image_size, device=device)
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + runs):
+            if device.type == 'cuda':
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            model(image)
+            if device.type == 'cuda':
+                torch.cuda.synchronize()
+            if i >= warmup:
+                timings.append(1000 * (time.perf_counter() - start))
+    model.train(was_training)
+    return statistics.median(timings)
+
+
+def prunable_channels(model):
+    # Inner (conv1/conv2) channels of every bottleneck; the residual width is left alone
+    return sum(block.conv1.out_channels + block.conv2.out_channels
+               for block in model.modules() if isinstance(block, Bottleneck))
+
+
+def _keep_conv_outputs(conv, keep):
+    pruned = nn.Conv2d(conv.in_channels, len(keep), conv.kernel_size, conv.stride, conv.padding,
+                       conv.dilation, conv.groups, conv.bias is not None).to(conv.weight.device)
+    pruned.weight.data = conv.weight.data[keep].clone()
+    if conv.bias is not None:
+        pruned.bias.data = conv.bias.data[keep].clone()
+    return pruned
+
+
+def _keep_conv_inputs(conv, keep):
+    pruned = nn.Conv2d(len(keep), conv.out_channels, conv.kernel_size, conv.stride, conv.padding,
+                       conv.dilation, conv.groups, conv.bias is not None).to(conv.weight.device)
+    pruned.weight.data = conv.weight.data[:, keep].clone()
+    if conv.bias is not None:
+        pruned.bias.data = conv.bias.data.clone()
+    return pruned
+
+
+def _keep_bn_channels(bn, keep):
+    pruned = nn.BatchNorm2d(len(keep), bn.eps, bn.momentum).to(bn.weight.device)
+    pruned.weight.data = bn.weight.data[keep].clone()
+    pruned.bias.data = bn.bias.data[keep].clone()
+    pruned.running_mean = bn.running_mean[keep].clone()
+    pruned.running_var = bn.running_var[keep].clone()
+    pruned.num_batches_tracked = bn.num_batches_tracked.clone()
+    return pruned
+
+
+def prune_channels(model, ratio, min_channels=8):
+    """Remove the `ratio` least important inner channels of every bottleneck.
+
+    Channels are ranked by the L1 norm of their filters. The convolutions and batch
+    norms are rebuilt without them, so the pruned model is genuinely smaller and
+    faster rather than masked. Returns the number of channels removed.
+    """
+    removed = 0
+    for block in model.modules():
+        if not isinstance(block, Bottleneck):
+            continue
+        for conv_name, bn_name, next_name in (('conv1', 'bn1', 'conv2'), ('conv2', 'bn2', 'conv3')):
+            conv = getattr(block, conv_name)
+            channels = conv.out_channels
+            target = max(min_channels, int(round(channels * (1 - ratio))))
+            if target >= channels:
+                continue
+            importance = conv.weight.detach().abs().sum(dim=(1, 2, 3))
+            keep = importance.topk(target).indices.sort().values
+            setattr(block, conv_name, _keep_conv_outputs(conv, keep))
+            setattr(block, bn_name, _keep_bn_channels(getattr(block, bn_name), keep))
+            setattr(block, next_name, _keep_conv_inputs(getattr(block, next_name), keep))
+            removed += channels - target
+    return removed
@@ -0,0 +1,158 @@
+import argparse
+import os
+import signal
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from cameraClassifier import WasteClassifier, start_camera_classification
+from modelLoading import load_model_lowmem
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = 'best_waste_classifier.pth'
+CATEGORIES_PATH = 'waste_categories.pth'
+
+
+def get_context():
+    # fork lets workers inherit the parent's weight pages directly; elsewhere the
+    # shared-memory tensors are handed to spawned workers by handle
+    method = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+    return mp.get_context(method)
+
+
+def load_shared_model():
+    # Only the weights: a WasteClassifier here would open the default stats journal
+    # and sync its pending detections from the parent before the workers fork
+    # Always on CPU: only CPU pages can be shared between processes, and a forked
+    # worker cannot use CUDA once the parent has initialized it
+    categories = torch.load(os.path.join(current_dir, CATEGORIES_PATH))
+    model = load_model_lowmem(os.path.join(current_dir, MODEL_PATH), len(categories), torch.device('cpu'))
+    model.share_memory()
+    return model
+
+
+def read_memory_kb(pid):
+    # Returns (RSS, PSS) in kB. PSS splits shared pages between the processes
+    # mapping them, so summing it gives the real total; summing RSS double counts.
+    rollup = f'/proc/{pid}/smaps_rollup'
+    if not os.path.exists(rollup):
+        return None, None
+    values = {}
+    with open(rollup) as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1])
+    return values.get('Rss:'), values.get('Pss:')
+
+
+def camera_worker(index, model, supabase_uid, source, serial_port, replay, fps, threads):
+    # Split the cores between cameras instead of every worker using all of them
+    torch.set_num_threads(threads)
+    # Each camera keeps its own stats journal and drives its own bin's Arduino
+    start_camera_classification(supabase_uid, source=source, replay=replay, fps=fps, model=model, display=False,
+                                stats_name=f'waste_stats_camera{index}', serial_port=serial_port)
+
+
+def run_host(cameras, replay=False, fps=30.0):
+    print(f"Loading shared model for {len(cameras)} cameras...")
+    model = load_shared_model()
+    threads = max(1, (os.cpu_count() or 1) // len(cameras))
+
+    ctx = get_context()
+    workers = []
+    for index, (source, supabase_uid, serial_port) in enumerate(cameras):
+        worker = ctx.Process(target=camera_worker,
+                             args=(index, model, supabase_uid, source, serial_port, replay, fps, threads), daemon=True)
+        worker.start()
+        print(f"Started camera worker {worker.pid} for '{source}' on serial port {serial_port or 'default'}")
+        workers.append(worker)
+
+    if hasattr(signal, 'SIGUSR1'):
+        # `kill -USR1 <host pid>` profiles every camera; signal a worker pid for just one
+        def forward_profile_request(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    os.kill(worker.pid, signal.SIGUSR1)
+        signal.signal(signal.SIGUSR1, forward_profile_request)
+
+    for worker in workers:
+        worker.join()
+
+
+def memory_probe_worker(model, ready, release):
+    # Load (or reuse) the model, run one inference, then hold still for measurement
+    classifier = WasteClassifier(MODEL_PATH, CATEGORIES_PATH, model=model, stats_name='memory_probe')
+    classifier.predict(np.zeros((480, 640, 3), dtype=np.uint8))
+    ready.put(os.getpid())
+    release.wait()
+
+
+def measure(label, ctx, model, num_workers):
+    ready = ctx.Queue()
+    release = ctx.Event()
+    workers = [ctx.Process(target=memory_probe_worker, args=(model, ready, release)) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    pids = [ready.get() for _ in workers]
+    if model is not None:
+        pids.insert(0, os.getpid())
+
+    print(f"\n{label}")
+    total_rss = total_pss = 0
+    for pid in pids:
+        rss, pss = read_memory_kb(pid)
+        if rss is None:
+            print("Per-process memory accounting needs /proc/<pid>/smaps_rollup (Linux)")
+            break
+        role = 'parent' if pid == os.getpid() else 'worker'
+        print(f"  {role} {pid}: RSS {rss / 1024:8.1f} MB  PSS {pss / 1024:8.1f} MB")
+        total_rss += rss
+        total_pss += pss
+    print(f"  total: RSS {total_rss / 1024:8.1f} MB  PSS {total_pss / 1024:8.1f} MB")
+
+    release.set()
+    for worker in workers:
+        worker.join()
+    return total_pss
+
+
+def memory_report(num_workers):
+    independent = measure(f"{num_workers} independent processes (each loads its own model)",
+                          mp.get_context('spawn'), None, num_workers)
+    shared = measure(f"{num_workers} workers sharing one model",
+                     get_context(), load_shared_model(), num_workers)
+    if independent and shared:
+        print(f"\nShared mode uses {shared / independent:.0%} of the independent-process memory")
+
+
+def parse_camera(spec):
+    # SOURCE[@SUPABASE_UID][#SERIAL_PORT], e.g. camera:1@<uid>#/dev/ttyACM1 or video:bin2.mp4
+    spec, _, serial_port = spec.partition('#')
+    source, _, supabase_uid = spec.partition('@')
+    return source, supabase_uid or None, serial_port or None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run several cameras from one process sharing a single model')
+    parser.add_argument('--camera', action='append', default=[], type=parse_camera,
+                        help='Camera as SOURCE[@SUPABASE_UID][#SERIAL_PORT]; repeat for each bin. Every bin '
+                             'needs its own Arduino port when there is more than one')
+    parser.add_argument('--replay', action='store_true',
+                        help='Process recorded sources as fast as possible')
+    parser.add_argument('--fps', type=float, default=30.0,
+                        help='Frame rate assumed for image directory and synthetic sources')
+    parser.add_argument('--memory_report', type=int, metavar='N',
+                        help='Compare memory of N shared workers against N independent processes and exit')
+    args = parser.parse_args()
+
+    if args.memory_report:
+        memory_report(args.memory_report)
+    elif args.camera:
+        serial_ports = [serial_port for _, _, serial_port in args.camera]
+        if len(args.camera) > 1 and (None in serial_ports or len(set(serial_ports)) < len(serial_ports)):
+            parser.error('each --camera needs its own #SERIAL_PORT when running several bins')
+        run_host(args.camera, args.replay, args.fps)
+    else:
+        parser.error('at least one --camera is required')
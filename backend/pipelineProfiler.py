@@ -0,0 +1,107 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import torch
+
+
+class PipelineProfiler:
+    """Captures profiles of the next N frames of the running camera loop.
+
+    `request()` arms a capture (safe to call from a signal handler); the loop calls
+    `on_frame()` at the top of every iteration. While a capture is running, the
+    Python loop is traced with cProfile, inference with torch.profiler, and
+    `stage()` blocks are timed and labelled in the trace. When the frames are done
+    a pstats file and a Chrome trace are written and a hotspot summary is printed.
+    """
+
+    def __init__(self, output_dir, frames=100):
+        self.output_dir = output_dir
+        self.default_frames = frames
+        self.requested_frames = 0
+        self.remaining = 0
+        self.python_profiler = None
+        self.torch_profiler = None
+        self.stage_times = defaultdict(list)
+
+    @property
+    def active(self):
+        return self.python_profiler is not None
+
+    def request(self, frames=None):
+        self.requested_frames = frames or self.default_frames
+
+    def on_frame(self):
+        if self.active:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self._stop()
+        elif self.requested_frames:
+            self._start(self.requested_frames)
+            self.requested_frames = 0
+
+    @contextmanager
+    def stage(self, name):
+        if not self.active:
+            yield
+            return
+        start = time.perf_counter()
+        with torch.profiler.record_function(name):
+            yield
+        self.stage_times[name].append(time.perf_counter() - start)
+
+    def _start(self, frames):
+        print(f"Profiling the next {frames} frames...")
+        self.remaining = frames
+        self.stage_times.clear()
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self.torch_profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+        self.torch_profiler.start()
+        self.python_profiler = cProfile.Profile()
+        self.python_profiler.enable()
+
+    def _stop(self):
+        self.python_profiler.disable()
+        self.torch_profiler.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        # The pid keeps captures from several camera workers apart
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        pstats_path = os.path.join(self.output_dir, f'loop-{stamp}.pstats')
+        trace_path = os.path.join(self.output_dir, f'trace-{stamp}.json')
+        self.python_profiler.dump_stats(pstats_path)
+        self.torch_profiler.export_chrome_trace(trace_path)
+
+        print(self.summary())
+        print(f"Wrote {pstats_path} and {trace_path} (open the trace in chrome://tracing or Perfetto)")
+        self.python_profiler = None
+        self.torch_profiler = None
+
+    def summary(self, limit=10):
+        lines = ["\nPipeline stages:"]
+        for name, samples in sorted(self.stage_times.items(), key=lambda item: -sum(item[1])):
+            lines.append(f"  {name:<20} {len(samples):5d} calls  mean {1000 * sum(samples) / len(samples):8.2f} ms  "
+                         f"total {sum(samples):7.3f} s")
+
+        stream = io.StringIO()
+        pstats.Stats(self.python_profiler, stream=stream).sort_stats('tottime').print_stats(limit)
+        lines.append("\nPython hotspots (by own time):")
+        # Skip the pstats preamble and keep the table
+        table = stream.getvalue().splitlines()
+        start = next((i for i, line in enumerate(table) if line.strip().startswith('ncalls')), 0)
+        lines.extend(line for line in table[start:] if line.strip())
+
+        lines.append("\nTorch operators (by self CPU time):")
+        lines.append(self.torch_profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=limit))
+        return '\n'.join(lines)
+
+    def close(self):
+        # Flush a capture that was cut short by the end of the stream
+        if self.active:
+            self._stop()
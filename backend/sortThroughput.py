@@ -0,0 +1,102 @@
+import argparse
+import contextlib
+import io
+import os
+import statistics
+
+import cameraClassifier
+from cameraClassifier import WasteClassifier, start_camera_classification
+from captureScheduler import EmulatedCamera
+from frameSources import SyntheticSource
+from virtualArduino import VirtualArduino
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+STATS_NAME = 'sort_throughput'
+
+
+def remove_stats_files():
+    for suffix in ('.json', '.journal'):
+        path = os.path.join(current_dir, STATS_NAME + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_rate(model, rate, duration, fps, flip_seconds, verbose=False):
+    """Feed items at `rate` per minute through the live pipeline into a virtual Arduino.
+
+    Frames are produced in real time by an emulated camera, classified, counted
+    and sent to the emulator over a pseudo-terminal, the same path a real bin
+    uses. Item 0 appears before the background model has learned the empty
+    scene, so it is left out of the counts.
+    """
+    period = max(2, int(round(fps * 60 / rate)))
+    num_frames = int(duration * fps)
+    source = SyntheticSource(num_frames=num_frames, fps=fps, period=period, item_frames=min(int(fps), period // 2))
+    camera = EmulatedCamera(source)
+
+    remove_stats_files()
+    arduino = VirtualArduino(flip_seconds).start()
+    cameraClassifier.connect_arduino(arduino.port)
+    output = None if verbose else io.StringIO()
+    with contextlib.redirect_stdout(output) if output is not None else contextlib.nullcontext():
+        # Every confident-or-not prediction is acted on and the item cache is off:
+        # this measures the sorting path, not the classifier's accuracy
+        start_camera_classification(None, cache_ttl=0.0, source=camera, fps=fps, model=model, display=False,
+                                    stats_name=STATS_NAME, reload_interval=None, confidence_threshold=0.0)
+    sent = sum(cameraClassifier.classifier.stats.values())
+    # Commands still queued on the controller are allowed to finish
+    arduino.wait_idle(timeout=(flip_seconds + 1) * (arduino.RX_BUFFER_SIZE // 4))
+    cameraClassifier.arduino.close()
+    cameraClassifier.arduino = None
+    arduino.stop()
+    remove_stats_files()
+
+    onsets = {k: k * period / fps for k in range(1, (num_frames - 1) // period + 1)}
+    sorted_items, queue_delays, latencies = set(), [], []
+    for event in arduino.events:
+        item = int((event['received'] - camera.start) * fps) // period
+        if item not in onsets or not event['accepted']:
+            continue
+        queue_delays.append(event['started'] - event['received'])
+        if item not in sorted_items:
+            sorted_items.add(item)
+            latencies.append(event['finished'] - camera.start - onsets[item])
+
+    handled = sum(event['accepted'] for event in arduino.events)
+    return {
+        'rate': rate,
+        'arrived': len(onsets),
+        'sorted': len(sorted_items),
+        'items_per_minute': 60 * len(sorted_items) / duration,
+        'dropped': len(onsets) - len(sorted_items),
+        'lost_on_serial': max(0, sent - handled),
+        'queue_mean': statistics.mean(queue_delays) if queue_delays else 0.0,
+        'queue_max': max(queue_delays, default=0.0),
+        'latency_mean': statistics.mean(latencies) if latencies else 0.0,
+    }
+
+
+def main(rates, duration, fps, flip_seconds, model_path, verbose):
+    model = WasteClassifier(model_path, 'waste_categories.pth').model
+    print(f"{duration:.0f}s of footage per rate, {flip_seconds:.1f}s flip")
+    print(f"{'arrivals/min':>12} {'arrived':>8} {'sorted':>7} {'sorted/min':>11} {'dropped':>8} "
+          f"{'serial lost':>12} {'queue mean s':>13} {'queue max s':>12} {'end-to-end s':>13}")
+    for rate in rates:
+        result = run_rate(model, rate, duration, fps, flip_seconds, verbose)
+        print(f"{result['rate']:12.1f} {result['arrived']:8d} {result['sorted']:7d} {result['items_per_minute']:11.1f} "
+              f"{result['dropped']:8d} {result['lost_on_serial']:12d} {result['queue_mean']:13.2f} "
+              f"{result['queue_max']:12.2f} {result['latency_mean']:13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='End-to-end sorting throughput against a virtual Arduino')
+    parser.add_argument('--rates', type=float, nargs='+', default=[4, 8, 12, 20, 30],
+                        help='Item arrival rates to test, in items per minute')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds of footage per rate')
+    parser.add_argument('--fps', type=float, default=30.0, help='Emulated camera frame rate')
+    parser.add_argument('--flip_seconds', type=float, default=3.0, help='Panel flip pause of the emulated sketch')
+    parser.add_argument('--model', type=str, default='best_waste_classifier.pth', help='Classifier checkpoint')
+    parser.add_argument('--verbose', action='store_true', help='Show the camera loop output')
+    args = parser.parse_args()
+
+    main(args.rates, args.duration, args.fps, args.flip_seconds, args.model, args.verbose)
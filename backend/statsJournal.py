@@ -0,0 +1,165 @@
+import json
+import os
+import time
+
+
+class StatsJournal:
+    """Append-only, crash-safe log of detections with periodic snapshot compaction.
+
+    Every detection is appended to `<name>.journal` as one JSON line and flushed to
+    the OS straight away, so a killed process loses nothing. fsyncs, which protect
+    against power loss, are batched: every `fsync_every` records, or once
+    `fsync_interval` seconds have passed, checked by `sync_if_due()` on every frame
+    so a quiet bin doesn't leave detections unsynced. Compaction writes the counters
+    and any detections not yet synced to the database into `<name>.json` via an
+    atomic rename, then starts a fresh journal.
+    On startup the snapshot is loaded and newer journal lines are replayed; a torn
+    last line from a crash is ignored.
+
+    Database sync is at-least-once: a crash after the database commit but before the
+    ack is durable replays that detection on the next sync.
+    """
+
+    def __init__(self, directory, categories, name='waste_stats', fsync_every=8, fsync_interval=1.0,
+                 compact_every=1000):
+        self.snapshot_path = os.path.join(directory, f'{name}.json')
+        self.journal_path = os.path.join(directory, f'{name}.journal')
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+
+        self.stats = {category: 0 for category in categories}
+        self.pending = {}  # seq -> detection record awaiting database sync
+        self.seq = 0
+        self.records_since_compaction = 0
+        self.unsynced_writes = 0
+        self.last_fsync = time.monotonic()
+
+        self._restore()
+        # Opened on the first write, so read-only users leave no files behind
+        self.journal = None
+
+    def _restore(self):
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if 'stats' in snapshot:
+                snapshot_seq = snapshot['seq']
+                self.stats.update(snapshot['stats'])
+                self.pending = {record['seq']: record for record in snapshot['pending']}
+            else:
+                # Legacy waste_stats.json: a plain {category: count} dict
+                self.stats.update(snapshot)
+        self.seq = snapshot_seq
+
+        if not os.path.exists(self.journal_path):
+            return
+        valid_bytes = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete line')
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash; nothing after it was acknowledged
+                    break
+                valid_bytes += len(line)
+                # Lines at or below the snapshot seq survived a crash mid-compaction
+                if record['seq'] <= snapshot_seq:
+                    continue
+                self._apply(record)
+                self.seq = record['seq']
+                self.records_since_compaction += 1
+
+        # Cut off the torn tail so new records aren't appended onto a partial line
+        if valid_bytes < os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def _apply(self, record):
+        if record['type'] == 'detection':
+            self.stats[record['category']] = self.stats.get(record['category'], 0) + 1
+            if record.get('supabase_uid'):
+                self.pending[record['seq']] = record
+        elif record['type'] == 'ack':
+            self.pending.pop(record['ack'], None)
+
+    def _append(self, record):
+        self.seq += 1
+        record['seq'] = self.seq
+        self._apply(record)
+        if self.journal is None:
+            self.journal = open(self.journal_path, 'a', encoding='utf-8')
+        self.journal.write(json.dumps(record) + '\n')
+        self.journal.flush()
+        self.unsynced_writes += 1
+        self.records_since_compaction += 1
+
+        if self.unsynced_writes >= self.fsync_every:
+            self.sync()
+        else:
+            self.sync_if_due()
+        if self.records_since_compaction >= self.compact_every:
+            self.compact()
+        return record
+
+    def record_detection(self, category, supabase_uid=None):
+        return self._append({'type': 'detection', 'category': category,
+                             'supabase_uid': supabase_uid, 'ts': time.time()})
+
+    def ack(self, seq):
+        # Mark a detection as written to the database
+        if seq in self.pending:
+            self._append({'type': 'ack', 'ack': seq})
+
+    def sync_pending(self, sync_record):
+        # Replay buffered detections in order; stop at the first failure so ordering
+        # is kept and the rest is retried next time
+        synced = 0
+        for seq in sorted(self.pending):
+            try:
+                sync_record(self.pending[seq])
+            except Exception as e:
+                print(f"Database unavailable, {len(self.pending)} detections buffered locally: {e}")
+                break
+            self.ack(seq)
+            synced += 1
+        return synced
+
+    def sync_if_due(self):
+        if self.unsynced_writes and time.monotonic() - self.last_fsync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.journal is None:
+            return
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.unsynced_writes = 0
+        self.last_fsync = time.monotonic()
+
+    def compact(self):
+        if self.journal is None:
+            return
+        self.sync()
+        snapshot = {'seq': self.seq, 'stats': self.stats, 'pending': [self.pending[s] for s in sorted(self.pending)]}
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # The snapshot now covers every journal line, so start a new journal
+        self.journal.close()
+        self.journal = open(self.journal_path, 'w', encoding='utf-8')
+        self.sync()
+        self.records_since_compaction = 0
+
+    def close(self):
+        self.compact()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
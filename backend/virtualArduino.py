@@ -0,0 +1,179 @@
+import argparse
+import os
+import select
+import threading
+import time
+import tty
+
+
+class VirtualArduino:
+    """Software stand-in for hardware/motorListener.ino on a pseudo-terminal.
+
+    Open `port` with pyserial exactly like the real board. Commands are handled
+    one at a time with the sketch's timing: a 4 ms motor pulse, the 3 s
+    `delay(3000)` while the item drops, the return pulse, and every
+    `Serial.println` at the configured baud rate. While a flip is in progress,
+    incoming bytes wait in a 64-byte receive buffer like the ATmega's. Bytes
+    that do not fit are lost, as they are on the board.
+
+    Every handled command is recorded in `events` with perf_counter timestamps.
+    """
+
+    RX_BUFFER_SIZE = 64
+    READ_TIMEOUT = 1.0  # Serial.readStringUntil default
+    TRASH_COMMANDS = ('trash', 'food_organics', 'miscellaneous_trash')
+    RECYCLE_COMMANDS = ('recycle', 'paper', 'glass', 'metal', 'cardboard')
+
+    def __init__(self, flip_seconds=3.0, pulse_seconds=0.004, baud=9600, echo=False):
+        self.flip_seconds = flip_seconds
+        self.pulse_seconds = pulse_seconds
+        self.byte_seconds = 10 / baud  # 8N1: start + 8 data + stop bits
+        self.echo = echo
+
+        self.master, self.slave = os.openpty()
+        # Raw mode so the line discipline neither echoes nor rewrites newlines
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+
+        self.rx = bytearray()
+        self.line_times = []  # receive time of each complete line in rx
+        self.dropped_bytes = 0
+        self.events = []
+        self.busy = False
+        self.cond = threading.Condition()
+        self.running = False
+        self.threads = [threading.Thread(target=self._receive, name='arduino-rx', daemon=True),
+                        threading.Thread(target=self._loop, name='arduino-loop', daemon=True)]
+
+    def start(self):
+        self.running = True
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def wait_idle(self, timeout=None):
+        # Block until every buffered command has been handled
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.cond:
+            while self.rx or self.busy:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def _receive(self):
+        while self.running:
+            readable, _, _ = select.select([self.master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master, 1024)
+            except (BlockingIOError, OSError):
+                continue
+            now = time.perf_counter()
+            with self.cond:
+                for byte in data:
+                    if len(self.rx) >= self.RX_BUFFER_SIZE:
+                        self.dropped_bytes += 1
+                        continue
+                    self.rx.append(byte)
+                    if byte == ord('\n'):
+                        self.line_times.append(now)
+                self.cond.notify_all()
+
+    def _read_line(self):
+        # Serial.readStringUntil('\n'): returns at the newline or after the timeout
+        with self.cond:
+            while self.running and not self.rx:
+                self.cond.wait()
+            if not self.running:
+                return None, None
+            deadline = time.perf_counter() + self.READ_TIMEOUT
+            while self.running and b'\n' not in self.rx and time.perf_counter() < deadline:
+                self.cond.wait(deadline - time.perf_counter())
+            end = self.rx.find(b'\n')
+            if end < 0:
+                line, received = bytes(self.rx), time.perf_counter()
+                self.rx.clear()
+            else:
+                line, received = bytes(self.rx[:end]), self.line_times.pop(0)
+                del self.rx[:end + 1]
+            self.busy = True
+        return line.decode(errors='replace').strip(), received
+
+    def _println(self, message):
+        data = (message + '\r\n').encode()
+        try:
+            os.write(self.master, data)
+        except (BlockingIOError, OSError):
+            # Nobody is reading the port; the host side drops the output
+            pass
+        if self.echo:
+            print(f"[arduino] {message}")
+        time.sleep(len(data) * self.byte_seconds)
+
+    def _pulse(self, direction):
+        self._println(f"Motors moving {direction} at speed: 1")
+        time.sleep(self.pulse_seconds)
+        self._println("Motors stopped")
+
+    def _loop(self):
+        self._println("Motor control system initialized. Waiting for camera input...")
+        self._println("Motors stopped")
+        while True:
+            command, received = self._read_line()
+            if command is None:
+                return
+            started = time.perf_counter()
+            if command in self.TRASH_COMMANDS:
+                self._println("Trash detected! Flipping panel clockwise.")
+                flip, back = 'clockwise', 'counter-clockwise'
+            elif command in self.RECYCLE_COMMANDS:
+                self._println("Recyclable item detected! Flipping panel counter-clockwise.")
+                flip, back = 'counter-clockwise', 'clockwise'
+            else:
+                flip = None
+                self._println("Unknown command received: " + command)
+
+            if flip is not None:
+                self._pulse(flip)
+                time.sleep(self.flip_seconds)
+                self._println("Returning panel to starting position.")
+                self._pulse(back)
+
+            with self.cond:
+                self.events.append({'command': command, 'accepted': flip is not None, 'received': received,
+                                    'started': started, 'finished': time.perf_counter()})
+                self.busy = False
+                self.cond.notify_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Emulate the motorListener Arduino on a pseudo-terminal')
+    parser.add_argument('--flip_seconds', type=float, default=3.0, help='Pause while the item drops')
+    parser.add_argument('--baud', type=int, default=9600, help='Emulated serial speed')
+    args = parser.parse_args()
+
+    arduino = VirtualArduino(args.flip_seconds, baud=args.baud, echo=True).start()
+    print(f"Virtual Arduino listening on {arduino.port}")
+    print(f"Run the classifier with: ARDUINO_PORT={arduino.port} python cameraClassifier.py")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        arduino.stop()
+        accepted = sum(event['accepted'] for event in arduino.events)
+        print(f"\nHandled {accepted} commands, dropped {arduino.dropped_bytes} bytes")